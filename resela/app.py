@@ -5,6 +5,7 @@ Starts and configs the flask application.
 
 import logging
 import logging.config
+import threading
 import warnings
 import flask
 
@@ -18,6 +19,7 @@ from flask_ini import FlaskIni
 from flask_login import LoginManager
 from flask_sqlalchemy import SQLAlchemy
 
+from resela.backend.classes.CallTracer import report_trace
 from resela.backend.managers.ErrorManager import error_page
 
 
@@ -73,6 +75,16 @@ domain = http://resela.eu
 upload_limit = 25
 allowed_extensions = ami,ari,aki,vhd,vmdk,raw,qcow2,vdi,iso,img
 instance_limit = 5
+trace_calls = off
+dashboard_ttl = 5
+image_credentials_ttl = 300
+image_index_ttl = 300
+image_usage_ttl = 600
+job_workers = 8
+job_ttl = 3600
+launch_per_user = 4
+launch_per_lab = 20
+snapshot_timeout = 3600
 
 [pru]
 user = no-reply@resela.eu
@@ -97,6 +109,36 @@ keystone = http://controller:5000/v3
 userhandler = http://controller:35357/v3
 region = RegionOne
 pwdsalt = ReSeLa
+token_cache_size = 1024
+token_cache_ttl = 300
+token_expiry_margin = 60
+profile_ttl = 300
+token_refresh_interval = 60
+token_refresh_window = 90
+scoped_session_cache_size = 4096
+scoped_session_ttl = 3600
+pool_size = 10
+pool_keepalive = 60
+catalog_ttl = 3600
+compute_api_version = 2.19
+server_inventory_ttl = 10
+server_inventory_full_refresh = 300
+keystone_catalog_ttl = 300
+membership_ttl = 300
+flavor_catalog_ttl = 3600
+security_group_ttl = 3600
+status_min_interval = 1
+status_max_interval = 10
+status_timeout = 360
+status_workers = 4
+request_timeout = 30
+
+[session]
+; cookie, memory or redis.
+backend = cookie
+redis_url = redis://localhost:6379/0
+memory_size = 65536
+lifetime = 86400
 
 [loggers]
 keys = root
@@ -276,6 +318,19 @@ def app_init(config=None):
             if not all_mandatory_options_set or both_tls_and_ssl_set:
                 exit(1)
 
+        # Sessions
+        # Keep the session content server side, unless cookies are configured.
+        if APP.iniconfig.get('session', 'backend') != 'cookie':
+            from resela.backend.classes.SessionStore import \
+                ServerSideSessionInterface, shared_store
+            APP.session_interface = ServerSideSessionInterface(shared_store())
+
+        # Keystone catalog
+        # Resolve courses, labs, groups and roles from memory from the start.
+        from resela.backend.classes.KeystoneCatalog import warm_catalog
+        threading.Thread(target=warm_catalog, name='keystone-catalog-warmup',
+                         daemon=True).start()
+
         # Database
         # Creating uri that the SQL-ORM uses to access the sql database
         APP.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+pymysql://' + \
@@ -306,3 +361,11 @@ def call_after_request_callbacks(response):
     for callback in getattr(flask.g, 'after_request_callbacks', ()):
         callback(response)
     return response
+
+
+@APP.after_request
+def report_calls(response):
+    # Report the OpenStack and Mikrotik calls made while serving the request.
+    if APP.iniconfig.getboolean('resela', 'trace_calls'):
+        return report_trace(response)
+    return response
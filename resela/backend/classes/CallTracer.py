@@ -0,0 +1,170 @@
+"""
+CallTracer.py
+*************
+"""
+
+import json
+import logging
+import re
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import flask
+
+LOG = logging.getLogger(__name__)
+
+# Attribute of `flask.g` holding the trace of the current request.
+TRACE_ATTRIBUTE = '_resela_trace'
+
+# Response header summarizing the trace in debug mode.
+TRACE_HEADER = 'X-Resela-Calls'
+
+# Path segments that are resource ids, replaced so that calls group per endpoint.
+_ID_SEGMENT = re.compile(r'/(?:[0-9a-fA-F]{32}|[0-9a-fA-F-]{36})(?=/|$)')
+
+
+class CallTrace:
+    """The calls to OpenStack and the Mikrotik made during one request."""
+
+    def __init__(self):
+        self.calls = []
+
+    def record(self, endpoint, seconds):
+        """Record a call.
+
+        :param endpoint: The method and endpoint called, e.g. \
+            `GET controller:8774/v2.1/servers/{id}`.
+        :type endpoint: `str`
+        :param seconds: Duration of the call.
+        :type seconds: `float`
+        """
+
+        self.calls.append((endpoint, seconds))
+
+    def endpoints(self):
+        """Aggregate the calls per endpoint, slowest endpoint first.
+
+        :return: The endpoint, count, total and maximum duration of each \
+            endpoint called.
+        :rtype: `list` of `dict`
+        """
+
+        stats = {}
+        for endpoint, seconds in self.calls:
+            stat = stats.setdefault(endpoint, {'endpoint': endpoint, 'count': 0,
+                                               'total': 0.0, 'max': 0.0})
+            stat['count'] += 1
+            stat['total'] += seconds
+            stat['max'] = max(stat['max'], seconds)
+        return sorted(stats.values(), key=lambda stat: stat['total'], reverse=True)
+
+    def summary(self):
+        """Summarize the trace.
+
+        :return: The number of calls, their total duration and the slowest call.
+        :rtype: `dict`
+        """
+
+        slowest = max(self.calls, key=lambda call: call[1], default=(None, 0.0))
+        return {
+            'count': len(self.calls),
+            'total': round(sum(seconds for _, seconds in self.calls), 4),
+            'slowest': {'endpoint': slowest[0], 'seconds': round(slowest[1], 4)}
+        }
+
+
+def current_trace():
+    """Retrieve the trace of the current request.
+
+    :return: The trace, or `None` outside of a request.
+    :rtype: `CallTrace`
+    """
+
+    if not flask.has_request_context():
+        return None
+    trace = getattr(flask.g, TRACE_ATTRIBUTE, None)
+    if trace is None:
+        trace = CallTrace()
+        setattr(flask.g, TRACE_ATTRIBUTE, trace)
+    return trace
+
+
+def endpoint_of(method, url):
+    """Name the endpoint of an HTTP call, with resource ids left out.
+
+    :param method: The HTTP method.
+    :type method: `str`
+    :param url: The URL called.
+    :type url: `str`
+    :return: E.g. `GET controller:8774/v2.1/servers/{id}`.
+    :rtype: `str`
+    """
+
+    parts = urlsplit(url)
+    return '%s %s%s' % (method, parts.netloc, _ID_SEGMENT.sub('/{id}', parts.path))
+
+
+def trace_response(response, *args, **kwargs):
+    """Response hook recording an HTTP call in the trace of the request."""
+
+    trace = current_trace()
+    if trace is not None:
+        trace.record(endpoint_of(response.request.method, response.request.url),
+                     response.elapsed.total_seconds())
+    return response
+
+
+@contextmanager
+def traced(endpoint):
+    """Record the duration of the enclosed call, e.g. an SSH command.
+
+    :param endpoint: Name of the call.
+    :type endpoint: `str`
+    """
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace = current_trace()
+        if trace is not None:
+            trace.record(endpoint, time.perf_counter() - start)
+
+
+def report_trace(response):
+    """Report the trace of the current request.
+
+    In debug mode, the summary is set as the `X-Resela-Calls` header and HTML
+    pages get a toolbar listing the endpoints called. Otherwise, the summary
+    is logged as one JSON line.
+
+    :param response: The response to the request.
+    :type response: `flask.Response`
+    :return: The response.
+    :rtype: `flask.Response`
+    """
+
+    trace = getattr(flask.g, TRACE_ATTRIBUTE, None)
+    if trace is None or not trace.calls:
+        return response
+
+    summary = trace.summary()
+    if not flask.current_app.debug:
+        LOG.info(json.dumps(dict(summary, path=flask.request.path,
+                                 method=flask.request.method,
+                                 status=response.status_code)))
+        return response
+
+    response.headers[TRACE_HEADER] = '%d calls; %.3f s; slowest %s %.3f s' % (
+        summary['count'], summary['total'], summary['slowest']['endpoint'],
+        summary['slowest']['seconds'])
+
+    if response.mimetype == 'text/html' and not response.direct_passthrough:
+        toolbar = flask.render_template('call_trace.html', summary=summary,
+                                        endpoints=trace.endpoints())
+        body = response.get_data(as_text=True)
+        if '</body>' in body:
+            response.set_data(body.replace('</body>', toolbar + '</body>', 1))
+
+    return response
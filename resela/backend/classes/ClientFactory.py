@@ -0,0 +1,156 @@
+"""
+ClientFactory.py
+****************
+"""
+
+import threading
+
+from glanceclient.client import Client as GlanceClient
+from keystoneclient.v3.client import Client as KeystoneClient
+from neutronclient.v2_0.client import Client as NeutronClient
+from novaclient.client import Client as NovaClient
+
+from resela.app import APP
+from resela.backend.classes.ServiceCatalog import service_catalog
+
+# Attribute under which the clients of a session are stored on the session.
+CLIENTS_ATTRIBUTE = '_resela_clients'
+
+
+class ClientFactory:
+    """Builds OpenStack clients and memoizes them per session.
+
+    The clients are stored on the session they belong to and share its
+    lifetime. Constructing a manager or handler for a session that already
+    has a client is therefore free of endpoint lookups and version
+    negotiation. Endpoints and versions come from the shared
+    `ServiceCatalog`; clients built before a refresh of the catalog are
+    rebuilt.
+    """
+
+    _lock = threading.Lock()
+
+    @classmethod
+    def _memoized(cls, os_session, key, build):
+        """Retrieve the memoized value of a session, building it if missing.
+
+        :param os_session: The session owning the value.
+        :type os_session: `keystoneauth1.session.Session`
+        :param key: Key of the value.
+        :type key: `tuple`
+        :param build: Function building the value.
+        :type build: `function`
+        :return: The memoized value.
+        """
+
+        with cls._lock:
+            memo = os_session.__dict__.setdefault(CLIENTS_ATTRIBUTE, {})
+            value = memo.get(key)
+
+        if value is None:
+            # Built outside the lock, as building may contact the controller.
+            value = build()
+            with cls._lock:
+                value = memo.setdefault(key, value)
+
+        return value
+
+    @staticmethod
+    def _region():
+        """Retrieve the configured region, `None` meaning any region."""
+
+        return APP.iniconfig.get('openstack', 'region') or None
+
+    @classmethod
+    def endpoint(cls, os_session, service_type, interface='public'):
+        """Retrieve the endpoint of a service from the shared service catalog.
+
+        :param os_session: An authenticated session.
+        :type os_session: `keystoneauth1.session.Session`
+        :param service_type: The service type, e.g. `compute`.
+        :type service_type: `str`
+        :param interface: The endpoint interface.
+        :type interface: `str`
+        :return: The endpoint URL.
+        :rtype: `str`
+        """
+
+        return service_catalog().endpoint(os_session, service_type,
+                                          interface=interface, region=cls._region())
+
+    @classmethod
+    def keystone(cls, os_session):
+        """Retrieve the Keystone v3 client of a session.
+
+        :rtype: `keystoneclient.v3.client.Client`
+        """
+
+        return cls._memoized(
+            os_session, ('identity', '3', service_catalog().generation),
+            lambda: KeystoneClient(
+                session=os_session,
+                region_name=cls._region()
+            )
+        )
+
+    @classmethod
+    def nova(cls, os_session, version=None):
+        """Retrieve the Nova client of a session.
+
+        :param version: The compute API microversion, defaults to the \
+            configured `compute_api_version` as supported by the controller.
+        :type version: `str`
+        :rtype: `novaclient.v2.client.Client`
+        """
+
+        if version is None:
+            version = service_catalog().api_version(
+                os_session, 'compute',
+                APP.iniconfig.get('openstack', 'compute_api_version'),
+                region=cls._region()
+            )
+
+        return cls._memoized(
+            os_session, ('compute', version, service_catalog().generation),
+            lambda: NovaClient(
+                version,
+                session=os_session,
+                endpoint_override=cls.endpoint(os_session, 'compute'),
+                region_name=cls._region()
+            )
+        )
+
+    @classmethod
+    def glance(cls, os_session, version='2'):
+        """Retrieve the Glance client of a session.
+
+        :param version: The image API version.
+        :type version: `str`
+        :rtype: `glanceclient.v2.client.Client`
+        """
+
+        return cls._memoized(
+            os_session, ('image', version, service_catalog().generation),
+            lambda: GlanceClient(
+                version,
+                session=os_session,
+                endpoint_override=cls.endpoint(os_session, 'image'),
+                region_name=cls._region()
+            )
+        )
+
+    @classmethod
+    def neutron(cls, os_session):
+        """Retrieve the Neutron client of a session.
+
+        :rtype: `neutronclient.v2_0.client.Client`
+        """
+
+        return cls._memoized(
+            os_session, ('network', '2.0', service_catalog().generation),
+            lambda: NeutronClient(
+                session=os_session,
+                endpoint_override=cls.endpoint(os_session, 'network'),
+                region_name=cls._region()
+            )
+        )
@@ -0,0 +1,130 @@
+"""
+ConnectionPool.py
+*****************
+"""
+
+import socket
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+from resela.app import APP
+from resela.backend.classes.CallTracer import trace_response
+from resela.backend.classes.KeystoneCatalog import invalidate_on_keystone_write
+from resela.backend.classes.RequestCache import forget_on_write
+from resela.backend.classes.ServerInventory import invalidate_on_server_write
+
+_HTTP_ADAPTER = None
+_HTTP_ADAPTER_LOCK = threading.Lock()
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTP adapter keeping a pool of warm connections per OpenStack host.
+
+    Every Resela session shares one instance of this adapter, so that
+    requests to Keystone, Nova, Glance and Neutron reuse established TCP/TLS
+    connections instead of opening a new one for each session. Only the
+    connections are shared: each session has its own cookies and headers.
+    """
+
+    def __init__(self, pool_size=10, keepalive=60):
+        """
+        :param pool_size: Maximum number of connections kept per host.
+        :type pool_size: `int`
+        :param keepalive: Seconds of idleness after which TCP keep-alive \
+            probes are sent on pooled connections. 0 disables keep-alive.
+        :type keepalive: `int`
+        """
+
+        self.keepalive = keepalive
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        """Create the pool manager, enabling TCP keep-alive on its sockets."""
+
+        if self.keepalive:
+            socket_options = list(HTTPConnection.default_socket_options)
+            socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                socket_options.append(
+                    (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive))
+            pool_kwargs['socket_options'] = socket_options
+
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+
+    def stats(self):
+        """Count the requests served by the pools of this adapter.
+
+        A hit is a request sent over an already established connection, a
+        miss is a request for which a new connection had to be opened.
+
+        :return: The number of hits, misses and pooled hosts.
+        :rtype: `dict`
+        """
+
+        pools = self.poolmanager.pools
+        hits = misses = 0
+        hosts = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            hosts += 1
+            misses += pool.num_connections
+            hits += max(pool.num_requests - pool.num_connections, 0)
+
+        return {'hits': hits, 'misses': misses, 'hosts': hosts}
+
+
+def http_adapter():
+    """Retrieve the process-wide adapter pooling the connections to OpenStack.
+
+    The adapter is created upon first use, with the pool size and keep-alive
+    taken from the `[openstack]` section of the configuration.
+
+    :return: The shared adapter.
+    :rtype: `PooledAdapter`
+    """
+
+    global _HTTP_ADAPTER
+
+    if _HTTP_ADAPTER is None:
+        with _HTTP_ADAPTER_LOCK:
+            if _HTTP_ADAPTER is None:
+                config = APP.iniconfig['openstack']
+                _HTTP_ADAPTER = PooledAdapter(pool_size=config.getint('pool_size'),
+                                              keepalive=config.getint('pool_keepalive'))
+    return _HTTP_ADAPTER
+
+
+def http_session():
+    """Build the HTTP session of one Resela session, over the shared adapter.
+
+    The session sends its requests over the pooled connections, while its
+    cookies and headers stay its own, so that a cookie set in answer to a
+    user's request is never sent along with those of another user.
+
+    :return: A new HTTP session.
+    :rtype: `requests.Session`
+    """
+
+    adapter = http_adapter()
+    http = requests.Session()
+    http.mount('http://', adapter)
+    http.mount('https://', adapter)
+    http.hooks['response'].extend((trace_response, forget_on_write,
+                                    invalidate_on_server_write,
+                                    invalidate_on_keystone_write))
+    return http
+
+
+def pool_stats():
+    """Count the hits and misses of the shared connection pool.
+
+    :return: The statistics of the shared adapter, see `PooledAdapter.stats`.
+    :rtype: `dict`
+    """
+
+    return http_adapter().stats()
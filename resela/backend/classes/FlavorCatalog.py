@@ -0,0 +1,119 @@
+"""
+FlavorCatalog.py
+****************
+"""
+
+import bisect
+import threading
+import time
+
+from resela.app import APP
+
+_FLAVOR_CATALOG = None
+_FLAVOR_CATALOG_LOCK = threading.Lock()
+
+
+class FlavorCatalog:
+    """Process-wide catalog of the flavors.
+
+    Flavors are kept as their attribute dicts, in the order Nova lists them,
+    with a name index and indexes sorted by disk and by RAM for finding the
+    flavors at least as big as a given size. Flavors almost never change, so
+    the catalog is listed anew only every `ttl` seconds.
+    """
+
+    def __init__(self, ttl=3600):
+        """
+        :param ttl: Seconds during which the catalog is used as is.
+        :type ttl: `int`
+        """
+
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._load([], None)
+
+    def _load(self, infos, loaded_at):
+        self._flavors = list(infos)
+        self._by_name = {info['name']: info for info in self._flavors}
+        self._by_disk = sorted((info['disk'], info['ram'], position)
+                               for position, info in enumerate(self._flavors))
+        self._by_ram = sorted((info['ram'], info['disk'], position)
+                              for position, info in enumerate(self._flavors))
+        self._loaded_at = loaded_at
+
+    def refresh(self, list_flavors, force=False):
+        """List the flavors anew, if the catalog expired.
+
+        :param list_flavors: Function listing the flavors, e.g. \
+            `FlavorManager.list`.
+        :type list_flavors: `function`
+        :param force: Whether to list even if the catalog is fresh.
+        :type force: `bool`
+        """
+
+        with self._lock:
+            now = time.time()
+            if not force and self._loaded_at is not None and \
+                    now - self._loaded_at < self.ttl:
+                return
+            self._load([flavor.to_dict() for flavor in list_flavors()], now)
+
+    def invalidate(self):
+        """Have the next read list the flavors anew."""
+
+        with self._lock:
+            self._loaded_at = None
+
+    def all(self):
+        """Retrieve the attributes of all flavors."""
+
+        with self._lock:
+            return list(self._flavors)
+
+    def find(self, name):
+        """Retrieve the attributes of a flavor by name, or `None`."""
+
+        with self._lock:
+            return self._by_name.get(name)
+
+    def at_least(self, disk=0, ram=0):
+        """Retrieve the flavors with at least the given disk and RAM.
+
+        :param disk: Minimum disk, in GB.
+        :type disk: `int`
+        :param ram: Minimum RAM, in MB.
+        :type ram: `int`
+        :return: The attributes of the flavors, smallest first.
+        :rtype: `list` of `dict`
+        """
+
+        with self._lock:
+            if disk or not ram:
+                start = bisect.bisect_left(self._by_disk, (disk,))
+                positions = [position for _, flavor_ram, position
+                             in self._by_disk[start:] if flavor_ram >= ram]
+            else:
+                start = bisect.bisect_left(self._by_ram, (ram,))
+                positions = [position for _, _, position in
+                             sorted((flavor_disk, flavor_ram, position) for
+                                    flavor_ram, flavor_disk, position in self._by_ram[start:])]
+            return [self._flavors[position] for position in positions]
+
+
+def flavor_catalog():
+    """Retrieve the process-wide flavor catalog.
+
+    :return: The catalog, or `None` if disabled by a `flavor_catalog_ttl` of 0.
+    :rtype: `FlavorCatalog`
+    """
+
+    global _FLAVOR_CATALOG
+
+    if _FLAVOR_CATALOG is None:
+        with _FLAVOR_CATALOG_LOCK:
+            if _FLAVOR_CATALOG is None:
+                ttl = APP.iniconfig['openstack'].getint('flavor_catalog_ttl')
+                if not ttl:
+                    return None
+                _FLAVOR_CATALOG = FlavorCatalog(ttl=ttl)
+    return _FLAVOR_CATALOG
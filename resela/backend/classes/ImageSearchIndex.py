@@ -0,0 +1,239 @@
+"""
+ImageSearchIndex.py
+*******************
+"""
+
+import threading
+import time
+from collections import defaultdict
+
+from resela.app import APP
+
+# Image attributes the library can be filtered on.
+FACETS = ('os', 'version', 'flavor', 'internet', 'library')
+
+_IMAGE_SEARCH_INDEXES = {}
+_IMAGE_SEARCH_INDEXES_LOCK = threading.Lock()
+
+
+def _terms(image):
+    """Extract the keywords and facet values of an image."""
+
+    name = getattr(image, 'name', None) or ''
+    keywords = {keyword.strip().lower() for keyword in
+                (getattr(image, 'keywords', None) or '').split(',')} - {''}
+    facets = {
+        'os': getattr(image, 'os', None),
+        'version': getattr(image, 'version', None),
+        'flavor': getattr(image, 'flavor_name', None),
+        'internet': getattr(image, 'internet', None),
+        'library': name.split('|')[1].lower() if name.count('|') >= 1 else None
+    }
+    return keywords, facets
+
+
+def _count(bitmap):
+    return bin(bitmap).count('1')
+
+
+class ImageSearchIndex:
+    """In-memory search index over the metadata of the images.
+
+    Each image gets a bit position. An inverted index maps each keyword to
+    the bitmap of the images having it, and each facet value, e.g. an OS, to
+    the bitmap of the images having that value, so that a search is a few
+    bitwise operations. The index is kept up to date by `ImageManager` as
+    images are created, updated and deleted, and rebuilt every `ttl` seconds
+    to catch changes made outside of Resela. The MD5 checksums of the images
+    are indexed as well, for finding duplicates.
+    """
+
+    def __init__(self, ttl=300):
+        """
+        :param ttl: Seconds after which the index is rebuilt from a listing.
+        :type ttl: `int`
+        """
+
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._ids = []
+        self._positions = {}
+        self._terms = {}
+        self._free = []
+        self._all = 0
+        self._keywords = defaultdict(int)
+        self._facets = {facet: defaultdict(int) for facet in FACETS}
+        self._checksums = defaultdict(set)
+        self._built_at = None
+
+    def refresh(self, list_images, force=False):
+        """Rebuild the index from a listing, if it expired.
+
+        :param list_images: Function listing the images, e.g. \
+            `ImageManager.list`.
+        :type list_images: `function`
+        :param force: Whether to rebuild even if the index is fresh.
+        :type force: `bool`
+        """
+
+        with self._lock:
+            now = time.time()
+            if not force and self._built_at is not None and \
+                    now - self._built_at < self.ttl:
+                return
+            images = list(list_images())
+            self._clear()
+            for image in images:
+                self.add(image)
+            self._built_at = now
+
+    def invalidate(self):
+        """Have the next search rebuild the index from a listing."""
+
+        with self._lock:
+            self._built_at = None
+
+    def add(self, image):
+        """Index an image, replacing what was indexed for it before."""
+
+        with self._lock:
+            self.remove(image.id)
+            position = self._free.pop() if self._free else len(self._ids)
+            if position == len(self._ids):
+                self._ids.append(image.id)
+            else:
+                self._ids[position] = image.id
+            bit = 1 << position
+
+            keywords, facets = _terms(image)
+            for keyword in keywords:
+                self._keywords[keyword] |= bit
+            for facet, value in facets.items():
+                self._facets[facet][value] |= bit
+
+            checksum = getattr(image, 'checksum', None)
+            if checksum:
+                self._checksums[checksum].add(image.id)
+
+            self._positions[image.id] = position
+            self._terms[image.id] = (keywords, facets, checksum)
+            self._all |= bit
+
+    def remove(self, image_id):
+        """Remove an image from the index, if indexed."""
+
+        with self._lock:
+            position = self._positions.pop(image_id, None)
+            if position is None:
+                return
+            mask = ~(1 << position)
+
+            keywords, facets, checksum = self._terms.pop(image_id)
+            for keyword in keywords:
+                self._keywords[keyword] &= mask
+                if not self._keywords[keyword]:
+                    del self._keywords[keyword]
+            for facet, value in facets.items():
+                self._facets[facet][value] &= mask
+                if not self._facets[facet][value]:
+                    del self._facets[facet][value]
+
+            if checksum:
+                self._checksums[checksum].discard(image_id)
+                if not self._checksums[checksum]:
+                    del self._checksums[checksum]
+
+            self._ids[position] = None
+            self._free.append(position)
+            self._all &= mask
+
+    def _match(self, keywords, facets):
+        with self._lock:
+            matches = self._all
+            if keywords:
+                matches = 0
+                for keyword in keywords:
+                    matches |= self._keywords.get(keyword, 0)
+            for facet, value in facets.items():
+                if value not in (None, ''):
+                    matches &= self._facets[facet].get(value, 0)
+            return matches
+
+    def search(self, keywords=(), **facets):
+        """Find the images having any of the keywords and all facet values.
+
+        :param keywords: Keywords, any of which an image must have. No \
+            keyword matches every image.
+        :type keywords: iterable of `str`
+        :param facets: Facet values, e.g. `os='Ubuntu'`, which an image must \
+            all have. Empty values are ignored.
+        :return: The ids of the matching images.
+        :rtype: `list` of `str`
+        """
+
+        keywords = {keyword.strip().lower() for keyword in keywords} - {''}
+        matches = self._match(keywords, facets)
+        with self._lock:
+            return [image_id for position, image_id in enumerate(self._ids)
+                    if matches >> position & 1]
+
+    def with_checksum(self, checksum):
+        """Find the images whose data has a MD5 checksum.
+
+        :param checksum: Hexadecimal MD5 digest.
+        :type checksum: `str`
+        :return: The ids of the images.
+        :rtype: `list` of `str`
+        """
+
+        with self._lock:
+            return list(self._checksums.get(checksum, ()))
+
+    def facet_counts(self, keywords=(), **facets):
+        """Count the images matching a search per value of each facet.
+
+        :return: The number of matching images, keyed by facet then value.
+        :rtype: `dict`
+        """
+
+        keywords = {keyword.strip().lower() for keyword in keywords} - {''}
+        matches = self._match(keywords, facets)
+        with self._lock:
+            return {facet: {value: _count(bitmap & matches)
+                            for value, bitmap in values.items()
+                            if value is not None and bitmap & matches}
+                    for facet, values in self._facets.items()}
+
+
+def image_search_index(scope):
+    """Retrieve the process-wide image search index of a scope.
+
+    Users see different images depending on their role in Glance, so there
+    is one index per scope, e.g. per Resela role.
+
+    :param scope: E.g. `admin`.
+    :type scope: `str`
+    :return: The index.
+    :rtype: `ImageSearchIndex`
+    """
+
+    with _IMAGE_SEARCH_INDEXES_LOCK:
+        index = _IMAGE_SEARCH_INDEXES.get(scope)
+        if index is None:
+            index = _IMAGE_SEARCH_INDEXES[scope] = ImageSearchIndex(
+                ttl=APP.iniconfig['resela'].getint('image_index_ttl'))
+        return index
+
+
+def image_search_indexes():
+    """Retrieve the image search indexes of every scope.
+
+    :return: The indexes, keyed by scope.
+    :rtype: `dict`
+    """
+
+    with _IMAGE_SEARCH_INDEXES_LOCK:
+        return dict(_IMAGE_SEARCH_INDEXES)
@@ -0,0 +1,139 @@
+"""
+ImageUsageIndex.py
+******************
+"""
+
+import threading
+import time
+from collections import defaultdict
+
+from resela.app import APP
+
+# Projects holding images rather than using them.
+LIBRARY_DOMAIN = 'imageLibrary'
+FACTORY_DOMAIN = 'snapshotFactory'
+
+_IMAGE_USAGE_INDEX = None
+_IMAGE_USAGE_INDEX_LOCK = threading.Lock()
+
+
+def used_images(info):
+    """List the images a lab or snapshot factory uses.
+
+    Labs list their images with the number of instances of each in
+    `img_list`, snapshot factories have their image in `base_img`. The
+    image library projects hold images without using them.
+
+    :param info: The attributes of the project.
+    :type info: `dict`
+    :return: The ids of the images used.
+    :rtype: `set` of `str`
+    """
+
+    name = info.get('name') or ''
+    if '|' not in name:
+        return set()
+    domain = name.split('|')[0]
+    if domain == FACTORY_DOMAIN:
+        return {info['base_img']} if info.get('base_img') else set()
+    if domain == LIBRARY_DOMAIN:
+        return set()
+    return {descriptor[0] for descriptor in info.get('img_list') or ()}
+
+
+class ImageUsageIndex:
+    """Reverse index of the labs and snapshot factories using each image.
+
+    Kept up to date by `LabManager` as labs are created, updated and
+    deleted, and rebuilt from a listing of the projects every `ttl` seconds
+    to catch changes made outside of Resela.
+    """
+
+    def __init__(self, ttl=600):
+        """
+        :param ttl: Seconds after which the index is rebuilt from a listing.
+        :type ttl: `int`
+        """
+
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._users = defaultdict(set)
+        self._labs = {}
+        self._built_at = None
+
+    def refresh(self, list_labs, force=False):
+        """Rebuild the index from a listing, if it expired.
+
+        :param list_labs: Function listing the projects, e.g. \
+            `LabManager.list`.
+        :type list_labs: `function`
+        :param force: Whether to rebuild even if the index is fresh.
+        :type force: `bool`
+        """
+
+        with self._lock:
+            now = time.time()
+            if not force and self._built_at is not None and \
+                    now - self._built_at < self.ttl:
+                return
+            labs = list_labs()
+            self._clear()
+            for lab in labs:
+                self.put(lab.to_dict())
+            self._built_at = now
+
+    def put(self, info):
+        """Index the images a project uses, replacing what was indexed for it."""
+
+        with self._lock:
+            self.discard(info['id'])
+            images = used_images(info)
+            for image_id in images:
+                self._users[image_id].add(info['id'])
+            self._labs[info['id']] = (info.get('name'), images)
+
+    def discard(self, lab_id):
+        """Remove a project from the index, if indexed."""
+
+        with self._lock:
+            _, images = self._labs.pop(lab_id, (None, ()))
+            for image_id in images:
+                self._users[image_id].discard(lab_id)
+                if not self._users[image_id]:
+                    del self._users[image_id]
+
+    def users_of(self, image_id):
+        """Find the labs and snapshot factories using an image.
+
+        :return: The id and name of each project using the image.
+        :rtype: `list` of `tuple`
+        """
+
+        with self._lock:
+            return sorted((lab_id, self._labs[lab_id][0])
+                          for lab_id in self._users.get(image_id, ()))
+
+    def is_used(self, image_id):
+        """Tell whether any lab or snapshot factory uses an image."""
+
+        with self._lock:
+            return bool(self._users.get(image_id))
+
+
+def image_usage_index():
+    """Retrieve the process-wide image usage index.
+
+    :rtype: `ImageUsageIndex`
+    """
+
+    global _IMAGE_USAGE_INDEX
+
+    if _IMAGE_USAGE_INDEX is None:
+        with _IMAGE_USAGE_INDEX_LOCK:
+            if _IMAGE_USAGE_INDEX is None:
+                _IMAGE_USAGE_INDEX = ImageUsageIndex(
+                    ttl=APP.iniconfig['resela'].getint('image_usage_ttl'))
+    return _IMAGE_USAGE_INDEX
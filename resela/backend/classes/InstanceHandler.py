@@ -3,10 +3,9 @@ InstanceHandler.py
 ******************
 """
 
-import time
-import novaclient.client as nclient
-
 from resela.app import APP
+from resela.backend.classes.ClientFactory import ClientFactory
+from resela.backend.classes.SecurityGroupHandler import SecurityGroupHandler
 
 
 class InstanceHandler:
@@ -24,8 +23,7 @@ class InstanceHandler:
         # handle input parameters
         self.session = session
         self.__instance = None
-        self.nova_client = nclient.Client(version='2.19',
-                                          session=self.session)
+        self.nova_client = ClientFactory.nova(self.session)
 
         if instance_id is not None:
             try:
@@ -58,19 +56,14 @@ class InstanceHandler:
         try:
             image = self.nova_client.images.find(name=image_name)
             flavor = self.nova_client.flavors.find(name=flavor_name)
-            # create instance
+            security_group = SecurityGroupHandler(self.session).group_id(
+                self.session.get_project_id(), 'internet' if internet == 'True' else 'no-internet')
+            # create instance, straight into its security group
             instance = self.nova_client.servers.create(name=instance_name, image=image,
                                                        flavor=flavor, nics=nics,
+                                                       security_groups=[security_group],
                                                        description=image_name.rsplit('|', 1)[1])
 
-            time.sleep(1)
-            if internet != 'True':
-                self.nova_client.servers.remove_security_group(instance.id, "default")
-                self.nova_client.servers.add_security_group(instance.id, "no-internet")
-            else:
-                self.nova_client.servers.remove_security_group(instance.id, "default")
-                self.nova_client.servers.add_security_group(instance.id, "internet")
-
         except Exception as error:
             # TODO: Change when logging is added
             if APP.config['DEBUG']:
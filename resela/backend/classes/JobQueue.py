@@ -0,0 +1,213 @@
+"""
+JobQueue.py
+***********
+"""
+
+import json
+import logging
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from resela.app import APP
+from resela.backend.classes.SessionStore import shared_store
+from resela.backend.classes.TTLCache import TTLCache
+
+LOG = logging.getLogger(__name__)
+
+_JOB_QUEUE = None
+_JOB_QUEUE_LOCK = threading.Lock()
+
+
+class Job:
+    """A long running task, e.g. launching a lab, with its progress.
+
+    The task reports the progress of each of its steps, e.g. of each
+    instance launched, with `step`. A task that raises fails with the error
+    as feedback. Every change is handed to `publish`, if given.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, owner, kind, publish=None):
+        """
+        :param owner: Id of the user who started the job.
+        :type owner: `str`
+        :param kind: What the job does, e.g. `launch_lab`.
+        :type kind: `str`
+        :param publish: Function called with the job when it changes.
+        :type publish: `function`
+        """
+
+        self.id = secrets.token_urlsafe(16)
+        self.owner = owner
+        self.kind = kind
+        self.status = Job.QUEUED
+        self.feedback = ''
+        self.steps = {}
+        self.created_at = time.time()
+        self.finished_at = None
+        self._publish = publish
+        self._lock = threading.Lock()
+
+    def _changed(self):
+        if self._publish is not None:
+            self._publish(self)
+
+    def step(self, name, status):
+        """Report the progress of a step.
+
+        :param name: The step, e.g. the name of an instance.
+        :type name: `str`
+        :param status: E.g. `BUILD` or `ACTIVE`.
+        :type status: `str`
+        """
+
+        with self._lock:
+            self.steps[name] = status
+        self._changed()
+
+    def finish(self, status, feedback=''):
+        """Set the status of the job, e.g. `Job.RUNNING` or `Job.FAILED`."""
+
+        with self._lock:
+            self.status = status
+            self.feedback = feedback
+            if status in (Job.DONE, Job.FAILED):
+                self.finished_at = time.time()
+        self._changed()
+
+    def to_dict(self):
+        """Describe the job, e.g. for the job status API."""
+
+        with self._lock:
+            return {
+                'id': self.id,
+                'owner': self.owner,
+                'kind': self.kind,
+                'status': self.status,
+                'feedback': self.feedback,
+                'steps': dict(self.steps),
+                'created_at': self.created_at,
+                'finished_at': self.finished_at
+            }
+
+
+class JobQueue:
+    """Runs jobs on a pool of worker threads, outside of the web requests.
+
+    Jobs are kept for `ttl` seconds after they were submitted, for their
+    status to be polled. Their status is published in the store shared by
+    the workers as well, so that any worker can answer the polls.
+    """
+
+    def __init__(self, workers=4, ttl=3600, store=None):
+        """
+        :param workers: Number of jobs run at the same time.
+        :type workers: `int`
+        :param ttl: Seconds during which a job can be looked up.
+        :type ttl: `int`
+        :param store: Store shared by the workers, see `shared_store`.
+        :type store: `MemoryStore` or `RedisStore`
+        """
+
+        self.ttl = ttl
+        self._store = store
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='resela-job')
+        self._jobs = TTLCache(maxsize=100000, ttl=ttl)
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+
+    def _publish(self, job):
+        if self._store is not None:
+            self._store.set('job:' + job.id, json.dumps(job.to_dict()), ttl=self.ttl)
+
+    def submit(self, owner, kind, func, *args, key=None, **kwargs):
+        """Queue a job.
+
+        :param owner: Id of the user starting the job.
+        :type owner: `str`
+        :param kind: What the job does, e.g. `launch_lab`.
+        :type kind: `str`
+        :param func: The task, called with the job as `job` keyword argument \
+            besides `args` and `kwargs`, inside an application context.
+        :type func: `function`
+        :param key: Identifies what the job works on, e.g. the user and lab \
+            launched. While a job with the same key is queued or running, \
+            it is returned instead of queueing another.
+        :type key: `str`
+        :return: The queued job.
+        :rtype: `Job`
+        """
+
+        with self._pending_lock:
+            if key is not None and key in self._pending:
+                return self._pending[key]
+            job = Job(owner, kind, publish=self._publish)
+            if key is not None:
+                self._pending[key] = job
+        self._jobs.set(job.id, job)
+        self._publish(job)
+        self._executor.submit(self._run, job, func, args, kwargs, key)
+        return job
+
+    def _run(self, job, func, args, kwargs, key):
+        job.finish(Job.RUNNING)
+        try:
+            with APP.app_context():
+                func(*args, job=job, **kwargs)
+        except Exception as error:
+            LOG.exception('Job %s (%s) failed.', job.id, job.kind)
+            job.finish(Job.FAILED, str(error))
+        else:
+            job.finish(Job.DONE)
+        finally:
+            if key is not None:
+                with self._pending_lock:
+                    self._pending.pop(key, None)
+
+    def status(self, job_id, owner=None):
+        """Describe a job, run by this worker or another.
+
+        :param job_id: Id of the job.
+        :type job_id: `str`
+        :param owner: Id of the user asking, who must own the job.
+        :type owner: `str`
+        :return: The job as described by `Job.to_dict`, or `None` if \
+            unknown or owned by someone else.
+        :rtype: `dict`
+        """
+
+        job = self._jobs.get(job_id)
+        if job is not None:
+            info = job.to_dict()
+        else:
+            value = self._store.get('job:' + job_id) if self._store is not None else None
+            info = json.loads(value) if value else None
+
+        if info is None or (owner is not None and info['owner'] != owner):
+            return None
+        return info
+
+
+def job_queue():
+    """Retrieve the process-wide job queue.
+
+    :rtype: `JobQueue`
+    """
+
+    global _JOB_QUEUE
+
+    if _JOB_QUEUE is None:
+        with _JOB_QUEUE_LOCK:
+            if _JOB_QUEUE is None:
+                config = APP.iniconfig['resela']
+                _JOB_QUEUE = JobQueue(workers=config.getint('job_workers'),
+                                      ttl=config.getint('job_ttl'),
+                                      store=shared_store())
+    return _JOB_QUEUE
@@ -0,0 +1,258 @@
+"""
+KeystoneCatalog.py
+******************
+"""
+
+import copy
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from keystoneclient import base
+
+from resela.app import APP
+
+LOG = logging.getLogger(__name__)
+
+# Keystone collections kept in the catalog, by their path segment.
+KINDS = {
+    'domains': 'domain',
+    'projects': 'project',
+    'groups': 'group',
+    'roles': 'role'
+}
+
+# Kinds the Keystone policy only lets these roles read. The catalog serves
+# them to callers with one of the roles only, others ask Keystone.
+RESTRICTED = {
+    'group': {'admin', 'teacher'},
+    'role': {'admin', 'teacher'}
+}
+
+_KEYSTONE_CATALOG = None
+_KEYSTONE_CATALOG_LOCK = threading.Lock()
+
+
+class KeystoneCatalog:
+    """Process-wide catalog of the domains, projects, groups and roles.
+
+    These rarely change, yet Resela resolves them by name or id on most
+    pages: courses are domains, labs are projects. Their attributes are kept
+    with a name to id and an id to attributes index per kind, and expire
+    `ttl` seconds after they were read.
+    """
+
+    def __init__(self, ttl=300):
+        """
+        :param ttl: Seconds during which an entry is used as is.
+        :type ttl: `int`
+        """
+
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_id = defaultdict(dict)
+        self._by_name = defaultdict(dict)
+
+    def put(self, kind, info, name=None):
+        """Store the attributes of an object.
+
+        :param kind: E.g. `project`.
+        :type kind: `str`
+        :param info: The attributes, as returned by `to_dict()`.
+        :type info: `dict`
+        :param name: Name the object was looked up by, if it differs from \
+            its actual name, e.g. `default` for the `Default` domain.
+        :type name: `str`
+        """
+
+        deadline = time.time() + self.ttl
+        with self._lock:
+            self._by_id[kind][info['id']] = (info, deadline)
+            for alias in {info.get('name'), name} - {None}:
+                self._by_name[kind].setdefault(alias, set()).add(info['id'])
+
+    def load(self, kind, infos):
+        """Replace all objects of a kind, e.g. with a full listing."""
+
+        with self._lock:
+            self._by_id[kind].clear()
+            self._by_name[kind].clear()
+        for info in infos:
+            self.put(kind, info)
+
+    def discard(self, kind, object_id):
+        """Forget an object, e.g. after it was updated or deleted."""
+
+        with self._lock:
+            self._by_id[kind].pop(object_id, None)
+            for ids in self._by_name[kind].values():
+                ids.discard(object_id)
+
+    def invalidate(self, kind=None):
+        """Forget all objects of a kind, or of every kind."""
+
+        with self._lock:
+            for name in [kind] if kind else list(self._by_id):
+                self._by_id[name].clear()
+                self._by_name[name].clear()
+
+    def get(self, kind, object_id):
+        """Retrieve the attributes of an object by id, or `None`."""
+
+        with self._lock:
+            entry = self._by_id[kind].get(object_id)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._by_id[kind][object_id]
+                return None
+            return entry[0]
+
+    def find(self, kind, name):
+        """Retrieve the attributes of the only object with a name, or `None`."""
+
+        with self._lock:
+            ids = self._by_name[kind].get(name)
+            if not ids or len(ids) > 1:
+                return None
+            object_id = next(iter(ids))
+        return self.get(kind, object_id)
+
+
+def keystone_catalog():
+    """Retrieve the process-wide Keystone catalog.
+
+    :return: The catalog, or `None` if disabled by a `keystone_catalog_ttl` \
+        of 0.
+    :rtype: `KeystoneCatalog`
+    """
+
+    global _KEYSTONE_CATALOG
+
+    if _KEYSTONE_CATALOG is None:
+        with _KEYSTONE_CATALOG_LOCK:
+            if _KEYSTONE_CATALOG is None:
+                ttl = APP.iniconfig['openstack'].getint('keystone_catalog_ttl')
+                if not ttl:
+                    return None
+                _KEYSTONE_CATALOG = KeystoneCatalog(ttl=ttl)
+    return _KEYSTONE_CATALOG
+
+
+def _bind(manager, info):
+    return manager.resource_class(manager, copy.deepcopy(info), loaded=True)
+
+
+def _catalog_for(manager, kind):
+    """Retrieve the catalog, if the caller may read objects of a kind from it."""
+
+    catalog = keystone_catalog()
+    if catalog is None or kind not in RESTRICTED:
+        return catalog
+    auth = getattr(getattr(manager.client, 'session', None), 'auth', None)
+    auth_ref = getattr(auth, 'auth_ref', None)
+    if auth_ref is None or not RESTRICTED[kind] & set(auth_ref.role_names):
+        return None
+    return catalog
+
+
+def cached_get(manager, kind, entity, read):
+    """Read an object through the catalog.
+
+    Objects of a kind in `RESTRICTED` are read from Keystone, enforcing its
+    policy, when the caller has none of the roles allowed to read them.
+
+    :param manager: The manager asking, to which the object is bound.
+    :param kind: E.g. `project`.
+    :type kind: `str`
+    :param entity: The object or its id.
+    :param read: Function reading the object from Keystone on a miss.
+    :type read: `function`
+    :return: The object.
+    """
+
+    catalog = _catalog_for(manager, kind)
+    if catalog is None:
+        return read(entity)
+
+    info = catalog.get(kind, base.getid(entity))
+    if info is not None:
+        return _bind(manager, info)
+    resource = read(entity)
+    catalog.put(kind, resource.to_dict())
+    return resource
+
+
+def cached_find(manager, kind, name, find):
+    """Find an object by name through the catalog, see `cached_get`.
+
+    :param manager: The manager asking, to which the object is bound.
+    :param kind: E.g. `group`.
+    :type kind: `str`
+    :param name: Name of the object.
+    :type name: `str`
+    :param find: Function finding the object in Keystone on a miss.
+    :type find: `function`
+    :return: The object.
+    """
+
+    catalog = _catalog_for(manager, kind)
+    if catalog is None:
+        return find(name=name)
+
+    info = catalog.find(kind, name)
+    if info is not None:
+        return _bind(manager, info)
+    resource = find(name=name)
+    catalog.put(kind, resource.to_dict(), name=name)
+    return resource
+
+
+def invalidate_on_keystone_write(response, *args, **kwargs):
+    """Response hook forgetting the objects Resela updates or deletes.
+
+    Installed on the shared HTTP session, so that every change Resela makes,
+    e.g. deleting a lab in `LabManager.delete_lab`, is seen by the next read.
+    Writes to relations, such as role grants or group memberships, leave the
+    objects as they are.
+    """
+
+    request = response.request
+    if request.method in ('GET', 'HEAD', 'POST'):
+        return response
+
+    catalog = _KEYSTONE_CATALOG
+    if catalog is not None:
+        segments = request.path_url.split('?')[0].strip('/').split('/')
+        if 'v3' in segments:
+            segments = segments[segments.index('v3') + 1:]
+            if len(segments) == 2 and segments[0] in KINDS:
+                catalog.discard(KINDS[segments[0]], segments[1])
+    return response
+
+
+def warm_catalog():
+    """Fill the catalog with every domain, project, group and role.
+
+    Lists them as the password reset user, if one is configured. Run at
+    startup, so that the first pages need not resolve names one by one.
+    """
+
+    from resela.backend.classes.ClientFactory import ClientFactory
+    from resela.model.User import authenticate
+
+    catalog = keystone_catalog()
+    if catalog is None or not APP.iniconfig.get('pru', 'pass'):
+        return
+
+    try:
+        keystone = ClientFactory.keystone(authenticate({
+            'username': APP.iniconfig.get('pru', 'user'),
+            'password': APP.iniconfig.get('pru', 'pass')
+        }))
+        for collection, kind in KINDS.items():
+            catalog.load(kind, [resource.to_dict() for resource in
+                                getattr(keystone, collection).list()])
+    except Exception:
+        LOG.warning('Unable to warm the Keystone catalog.', exc_info=True)
@@ -6,6 +6,7 @@ NetworkHandler.py
 import neutronclient.v2_0.client as netclient
 
 from resela.app import APP
+from resela.backend.classes.ClientFactory import ClientFactory
 
 
 class NetworkHandler:
@@ -16,7 +17,7 @@ class NetworkHandler:
         """Constructor for the network handler."""
 
         self.session = session
-        self.neutron_client = netclient.Client(session=self.session)
+        self.neutron_client = ClientFactory.neutron(self.session)
 
     def create_network(self, network_name, shared=True):
         """Function that creates a network (private or public).
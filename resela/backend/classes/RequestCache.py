@@ -0,0 +1,89 @@
+"""
+RequestCache.py
+***************
+"""
+
+from functools import wraps
+
+import flask
+
+# Attribute of `flask.g` holding the identity map of the current request.
+CACHE_ATTRIBUTE = '_resela_request_cache'
+
+# Writes that do not change any resource, and thus keep the identity map.
+_NEUTRAL_WRITES = ('/auth/tokens',)
+
+
+def request_cache():
+    """Retrieve the identity map of the current request.
+
+    The map lives on `flask.g` and is discarded along with it when the
+    request is torn down.
+
+    :return: The identity map, or `None` outside of a request.
+    :rtype: `dict`
+    """
+
+    if not flask.has_request_context():
+        return None
+    return flask.g.setdefault(CACHE_ATTRIBUTE, {})
+
+
+def clear_request_cache():
+    """Forget every read made during the current request."""
+
+    cache = request_cache()
+    if cache is not None:
+        cache.clear()
+
+
+def _key(value):
+    """Represent an argument of a read in a cache key, resources by their id."""
+
+    return repr(getattr(value, 'id', value))
+
+
+def request_memoized(kind):
+    """Decorate a manager's read so that it is made once per request.
+
+    The result is keyed by `kind`, the client of the manager (its `_client`)
+    and the arguments. Pass `fresh=True` to read anew, e.g. when polling the
+    status of a resource.
+
+    :param kind: The kind of resource read, e.g. `lab`.
+    :type kind: `str`
+    :return: A decorator.
+    :rtype: `function`
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapped(self, *args, fresh=False, **kwargs):
+            cache = request_cache()
+            if cache is None:
+                return func(self, *args, **kwargs)
+
+            key = (kind, id(getattr(self, '_client', self)),
+                   tuple(_key(arg) for arg in args),
+                   tuple(sorted((name, _key(arg)) for name, arg in kwargs.items())))
+            if fresh or key not in cache:
+                cache[key] = func(self, *args, **kwargs)
+            return cache[key]
+
+        return wrapped
+
+    return decorator
+
+
+def forget_on_write(response, *args, **kwargs):
+    """Response hook clearing the identity map after a write to OpenStack.
+
+    Installed on the shared HTTP session, so that no read made before a
+    create, update or delete is handed out after it.
+    """
+
+    request = response.request
+    if request.method not in ('GET', 'HEAD') and \
+            not request.path_url.endswith(_NEUTRAL_WRITES):
+        clear_request_cache()
+    return response
@@ -3,9 +3,39 @@ SecurityGroupHandler.py
 ***********************
 """
 
-from neutronclient.v2_0 import client
+import logging
+import threading
+
 from flask import current_app
 
+from resela.app import APP
+from resela.backend.classes.ClientFactory import ClientFactory
+from resela.backend.classes.TTLCache import TTLCache
+
+LOG = logging.getLogger(__name__)
+
+_GROUP_IDS_CACHE = None
+_GROUP_IDS_CACHE_LOCK = threading.Lock()
+
+
+def group_ids_cache():
+    """Retrieve the process-wide cache of the security group ids of the labs.
+
+    :return: The ids of the security groups by name, keyed by project id.
+    :rtype: `TTLCache`
+    """
+
+    global _GROUP_IDS_CACHE
+
+    if _GROUP_IDS_CACHE is None:
+        with _GROUP_IDS_CACHE_LOCK:
+            if _GROUP_IDS_CACHE is None:
+                _GROUP_IDS_CACHE = TTLCache(
+                    maxsize=4096,
+                    ttl=APP.iniconfig['openstack'].getint('security_group_ttl'))
+    return _GROUP_IDS_CACHE
+
+
 class SecurityGroupHandler:
     """Security group handler class. Used to manage the security groups in the ReSeLa project.
     Security groups works like virtual firewalls."""
@@ -19,7 +49,7 @@ class SecurityGroupHandler:
 
         # handle input parameters
         self.session = session
-        self.neutron_client = client.Client(session=self.session)
+        self.neutron_client = ClientFactory.neutron(self.session)
 
     def create(self, name, description, tenant_id):
         """Creates a new security group.
@@ -33,6 +63,7 @@ class SecurityGroupHandler:
         try:
             body = {'security_group': {'name': name, 'description': description, 'tenant_id':
                                        tenant_id}}
+            group_ids_cache().pop(tenant_id)
             return self.neutron_client.create_security_group(body=body)
 
         except Exception as error:
@@ -74,6 +105,38 @@ class SecurityGroupHandler:
         except Exception as error:
             print(error)
 
+    def group_id(self, tenant_id, name):
+        """Find the id of a security group of a project, e.g. of a lab.
+
+        The ids of the groups of a project are listed once and cached for
+        `security_group_ttl` seconds, as these only change when the project
+        is created or deleted.
+
+        :param tenant_id: id of the project owning the group
+        :param name: name of the security group, e.g. internet
+        :return: the id of the group, or its name if it could not be found. \
+            Nova accepts either when creating an instance.
+        """
+
+        ids = group_ids_cache().get(tenant_id)
+        if ids is None:
+            try:
+                groups = self.neutron_client.list_security_groups(
+                    tenant_id=tenant_id)['security_groups']
+            except Exception:
+                LOG.warning('Unable to list the security groups of %s.', tenant_id,
+                            exc_info=True)
+                return name
+            ids = group_ids_cache().set(
+                tenant_id, {group['name']: group['id'] for group in groups})
+        return ids.get(name, name)
+
+    @staticmethod
+    def forget_group_ids(tenant_id):
+        """Forget the cached security group ids of a project, e.g. once deleted."""
+
+        group_ids_cache().pop(tenant_id)
+
     def create_rule(self, security_group_id, direction, ethertype, protocol=None, description="",
                     port_range_min=None, port_range_max=None, remote_ip_prefix=None):
         """Creates a new rule on a security group with the specified properties.
@@ -0,0 +1,234 @@
+"""
+ServerInventory.py
+******************
+"""
+
+import bisect
+import datetime
+import threading
+import time
+from collections import defaultdict
+
+from resela.app import APP
+
+# Seconds subtracted from the last refresh when asking for changes, covering
+# the clock skew between Resela and Nova.
+CHANGES_SINCE_MARGIN = 5
+
+_SERVER_INVENTORY = None
+_SERVER_INVENTORY_LOCK = threading.Lock()
+
+
+def _image_id(info):
+    """Retrieve the image id of a server, `None` if booted from a volume."""
+
+    image = info.get('image')
+    return image.get('id') if isinstance(image, dict) else None
+
+
+class ServerInventory:
+    """Process-wide inventory of the servers of all tenants.
+
+    Servers are kept as their attribute dicts and indexed by user, tenant,
+    image and name. The inventory is refreshed at most every `ttl` seconds,
+    or upon the next read after `invalidate`, by asking Nova for the servers
+    changed since the last refresh. Every `full_refresh` seconds, the whole
+    list is fetched anew.
+    """
+
+    def __init__(self, ttl=10, full_refresh=300):
+        """
+        :param ttl: Seconds during which the inventory is used as is.
+        :type ttl: `int`
+        :param full_refresh: Seconds after which all servers are listed anew.
+        :type full_refresh: `int`
+        """
+
+        self.ttl = ttl
+        self.full_refresh = full_refresh
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._generation = 0
+        self._clear()
+
+    def _clear(self):
+        self._servers = {}
+        self._by_user = defaultdict(set)
+        self._by_tenant = defaultdict(set)
+        self._by_image = defaultdict(set)
+        self._names = []
+        self._refreshed_at = None
+        self._listed_at = None
+        self._stale = True
+
+    def _add(self, info):
+        self._discard(info['id'])
+        self._servers[info['id']] = info
+        self._by_user[info.get('user_id')].add(info['id'])
+        self._by_tenant[info.get('tenant_id')].add(info['id'])
+        self._by_image[_image_id(info)].add(info['id'])
+        bisect.insort(self._names, (info.get('name') or '', info['id']))
+
+    def _discard(self, server_id):
+        info = self._servers.pop(server_id, None)
+        if info is None:
+            return
+        self._by_user[info.get('user_id')].discard(server_id)
+        self._by_tenant[info.get('tenant_id')].discard(server_id)
+        self._by_image[_image_id(info)].discard(server_id)
+        entry = (info.get('name') or '', server_id)
+        index = bisect.bisect_left(self._names, entry)
+        if index < len(self._names) and self._names[index] == entry:
+            del self._names[index]
+
+    def refresh(self, list_servers, force=False):
+        """Bring the inventory up to date, if it is stale.
+
+        Nova is asked outside of the lock, so that reads are not held up by
+        a slow listing. While another thread refreshes the inventory, the
+        servers known so far are read as they are, unless there are none.
+
+        :param list_servers: Function listing servers, called with the \
+            search options, e.g. `InstanceManager.list`.
+        :type list_servers: `function`
+        :param force: Whether to refresh even if the inventory is fresh.
+        :type force: `bool`
+        """
+
+        if not self._refresh_lock.acquire(blocking=self._refreshed_at is None or force):
+            return
+        try:
+            with self._lock:
+                now = time.time()
+                if not force and not self._stale and \
+                        now - self._refreshed_at < self.ttl:
+                    return
+                full = self._listed_at is None or now - self._listed_at >= self.full_refresh
+                refreshed_at = self._refreshed_at
+                generation = self._generation
+
+            if full:
+                servers = list_servers(search_opts={'all_tenants': True})
+            else:
+                since = datetime.datetime.fromtimestamp(
+                    refreshed_at - CHANGES_SINCE_MARGIN, datetime.timezone.utc)
+                servers = list_servers(search_opts={
+                    'all_tenants': True,
+                    'changes-since': since.strftime('%Y-%m-%dT%H:%M:%SZ')
+                })
+            servers = list(servers)
+
+            with self._lock:
+                if full:
+                    self._clear()
+                    self._listed_at = now
+                for server in servers:
+                    if server.status in ('DELETED', 'SOFT_DELETED'):
+                        self._discard(server.id)
+                    else:
+                        self._add(server.to_dict())
+                self._refreshed_at = now
+                # Invalidated while listing, the changes may not be listed.
+                self._stale = generation != self._generation
+        finally:
+            self._refresh_lock.release()
+
+    def invalidate(self, server_id=None):
+        """Have the next read fetch the changes, e.g. after a server changed.
+
+        :param server_id: Id of a server known to be deleted.
+        :type server_id: `str`
+        """
+
+        with self._lock:
+            if server_id is not None:
+                self._discard(server_id)
+            self._stale = True
+            self._generation += 1
+
+    def _select(self, ids):
+        with self._lock:
+            return [self._servers[server_id] for server_id in ids
+                    if server_id in self._servers]
+
+    def get(self, server_id):
+        """Retrieve the attributes of a server, or `None`."""
+
+        with self._lock:
+            return self._servers.get(server_id)
+
+    def all(self):
+        """Retrieve the attributes of all servers."""
+
+        return self._select(list(self._servers))
+
+    def for_user(self, user_id):
+        """Retrieve the servers of a user."""
+
+        return self._select(list(self._by_user.get(user_id, ())))
+
+    def for_tenant(self, tenant_id):
+        """Retrieve the servers of a project, i.e. a lab."""
+
+        return self._select(list(self._by_tenant.get(tenant_id, ())))
+
+    def for_image(self, image_id):
+        """Retrieve the servers booted from an image."""
+
+        return self._select(list(self._by_image.get(image_id, ())))
+
+    def with_prefix(self, prefix):
+        """Retrieve the servers whose name starts with `prefix`, e.g. a lab name."""
+
+        with self._lock:
+            index = bisect.bisect_left(self._names, (prefix, ''))
+            ids = []
+            while index < len(self._names) and \
+                    self._names[index][0].startswith(prefix):
+                ids.append(self._names[index][1])
+                index += 1
+        return self._select(ids)
+
+
+def server_inventory():
+    """Retrieve the process-wide server inventory.
+
+    :return: The inventory, or `None` if disabled by a `server_inventory_ttl` \
+        of 0.
+    :rtype: `ServerInventory`
+    """
+
+    global _SERVER_INVENTORY
+
+    if _SERVER_INVENTORY is None:
+        with _SERVER_INVENTORY_LOCK:
+            if _SERVER_INVENTORY is None:
+                config = APP.iniconfig['openstack']
+                if not config.getint('server_inventory_ttl'):
+                    return None
+                _SERVER_INVENTORY = ServerInventory(
+                    ttl=config.getint('server_inventory_ttl'),
+                    full_refresh=config.getint('server_inventory_full_refresh'))
+    return _SERVER_INVENTORY
+
+
+def invalidate_on_server_write(response, *args, **kwargs):
+    """Response hook invalidating the inventory after a write to a server.
+
+    Installed on the shared HTTP session, so that every create, delete or
+    state change Resela makes is seen by the next read of the inventory.
+    """
+
+    request = response.request
+    if request.method in ('GET', 'HEAD') or '/servers' not in request.path_url:
+        return response
+
+    inventory = _SERVER_INVENTORY
+    if inventory is not None:
+        path = request.path_url.split('?')[0].rstrip('/')
+        if request.method == 'DELETE' and response.ok and \
+                path.rsplit('/', 2)[-2] == 'servers':
+            inventory.invalidate(path.rsplit('/', 1)[-1])
+        else:
+            inventory.invalidate()
+    return response
@@ -0,0 +1,189 @@
+"""
+ServiceCatalog.py
+*****************
+"""
+
+import logging
+import threading
+import time
+
+from keystoneauth1 import discover
+from keystoneauth1 import exceptions as ksa_exceptions
+
+from resela.app import APP
+from resela.backend.classes.TTLCache import TTLCache
+
+LOG = logging.getLogger(__name__)
+
+# Stands in for the project id in cached endpoint URLs, e.g. Nova's.
+PROJECT_PLACEHOLDER = '%(project_id)s'
+
+_SERVICE_CATALOG = None
+_SERVICE_CATALOG_LOCK = threading.Lock()
+
+
+class ServiceCatalog:
+    """Process-wide cache of service endpoints and supported API versions.
+
+    Every session is handed the same discovery cache, so the version
+    documents of Keystone, Nova, Glance and Neutron are fetched once per
+    `ttl` rather than once per session. Endpoints are kept as templates in
+    which the project id is substituted per session, and microversions are
+    negotiated once against the maximum the controller supports.
+
+    Upon an endpoint or connection error, `refresh` drops everything and
+    bumps `generation`, so that clients built from stale data are rebuilt.
+    """
+
+    def __init__(self, ttl=3600):
+        """
+        :param ttl: Seconds after which endpoints and versions are discovered \
+            anew.
+        :type ttl: `int`
+        """
+
+        self.ttl = ttl
+        self.generation = 0
+        self.discovery_cache = {}
+        self._discovered_at = time.time()
+        self._endpoints = TTLCache(maxsize=256, ttl=ttl)
+        self._versions = TTLCache(maxsize=64, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        """Empty the discovery cache once it is older than `ttl`."""
+
+        with self._lock:
+            if self._discovered_at + self.ttl <= time.time():
+                # Emptied in place, as every session refers to this dict.
+                self.discovery_cache.clear()
+                self._discovered_at = time.time()
+
+    def refresh(self):
+        """Forget all endpoints and versions, e.g. after an endpoint error."""
+
+        with self._lock:
+            self.discovery_cache.clear()
+            self._discovered_at = time.time()
+            self._endpoints.clear()
+            self._versions.clear()
+            self.generation += 1
+
+        LOG.info('Service catalog refreshed (generation %d).', self.generation)
+
+    def endpoint(self, os_session, service_type, interface='public', region=None):
+        """Retrieve the endpoint of a service for the project of a session.
+
+        :param os_session: An authenticated session.
+        :type os_session: `keystoneauth1.session.Session`
+        :param service_type: The service type, e.g. `compute`.
+        :type service_type: `str`
+        :param interface: The endpoint interface.
+        :type interface: `str`
+        :param region: The region, `None` meaning any region.
+        :type region: `str`
+        :raises keystoneauth1.exceptions.EndpointNotFound: If the catalog \
+            has no such endpoint.
+        :return: The endpoint URL.
+        :rtype: `str`
+        """
+
+        self._expire()
+        key = (service_type, interface, region)
+        project_id = os_session.get_project_id()
+        template = self._endpoints.get(key)
+
+        if template is not None and PROJECT_PLACEHOLDER in template:
+            if project_id:
+                return template.replace(PROJECT_PLACEHOLDER, project_id)
+            template = None
+
+        if template is not None:
+            return template
+
+        url = os_session.get_endpoint(service_type=service_type,
+                                      interface=interface, region_name=region)
+        if url is None:
+            raise ksa_exceptions.EndpointNotFound(
+                'No %s endpoint for %s' % (interface, service_type))
+
+        if project_id:
+            self._endpoints.set(key, url.replace(project_id, PROJECT_PLACEHOLDER))
+        else:
+            self._endpoints.set(key, url)
+        return url
+
+    def api_version(self, os_session, service_type, wanted, interface='public',
+                    region=None):
+        """Negotiate the microversion of a service.
+
+        The version document is read from the endpoint of the service in the
+        catalog, since the keystoneclient auth plugins of Resela's sessions
+        do not discover endpoint data themselves.
+
+        :param os_session: An authenticated session.
+        :type os_session: `keystoneauth1.session.Session`
+        :param service_type: The service type, e.g. `compute`.
+        :type service_type: `str`
+        :param wanted: The microversion Resela is written against, e.g. `2.19`.
+        :type wanted: `str`
+        :param interface: The endpoint interface.
+        :type interface: `str`
+        :param region: The region, `None` meaning any region.
+        :type region: `str`
+        :return: `wanted`, or the maximum supported by the controller if lower.
+        :rtype: `str`
+        """
+
+        self._expire()
+        key = (service_type, wanted, interface, region)
+        version = self._versions.get(key)
+        if version is not None:
+            return version
+
+        version = wanted
+        try:
+            url = self.endpoint(os_session, service_type, interface=interface,
+                                region=region)
+            project_id = os_session.get_project_id()
+            url = url.rstrip('/')
+            if project_id and url.endswith('/' + project_id):
+                # The version document is served above the project.
+                url = url[:-len(project_id) - 1]
+            documents = discover.get_version_data(os_session, url)
+        except (ksa_exceptions.ClientException, AttributeError):
+            LOG.warning('Version discovery of %s failed, assuming %s.',
+                        service_type, wanted, exc_info=True)
+            return version
+
+        maximums = [discover.normalize_version_number(document.get('version') or
+                                                      document['max_version'])
+                    for document in documents
+                    if document.get('version') or document.get('max_version')]
+        maximum = max(maximums, default=None)
+        if maximum and tuple(maximum) < discover.normalize_version_number(wanted):
+            version = '%d.%d' % tuple(maximum[:2])
+            LOG.warning('%s supports microversion %s at most, wanted %s.',
+                        service_type, version, wanted)
+
+        return self._versions.set(key, version)
+
+
+def service_catalog():
+    """Retrieve the process-wide service catalog.
+
+    The catalog is created upon first use, with the time to live taken from
+    the `[openstack]` section of the configuration.
+
+    :return: The shared service catalog.
+    :rtype: `ServiceCatalog`
+    """
+
+    global _SERVICE_CATALOG
+
+    if _SERVICE_CATALOG is None:
+        with _SERVICE_CATALOG_LOCK:
+            if _SERVICE_CATALOG is None:
+                _SERVICE_CATALOG = ServiceCatalog(
+                    ttl=APP.iniconfig['openstack'].getint('catalog_ttl'))
+    return _SERVICE_CATALOG
@@ -0,0 +1,105 @@
+"""
+SessionRegistry.py
+******************
+"""
+
+import time
+
+from resela.backend.classes.TTLCache import TTLCache
+from resela.backend.classes.TokenCache import TokenCache
+
+
+class SessionRegistry:
+    """Registry of project scoped sessions.
+
+    Scoping a token to a project is a round-trip to Keystone. The registry
+    keeps the resulting session, keyed by the user's token and the project,
+    so that repeated actions in the same lab reuse the scoped token and the
+    connections of the session until the token nears its expiry.
+    """
+
+    def __init__(self, maxsize=4096, ttl=3600, margin=60):
+        """
+        :param maxsize: Maximum number of sessions held.
+        :type maxsize: `int`
+        :param ttl: Seconds after which a session is scoped anew.
+        :type ttl: `int`
+        :param margin: Seconds before the scoped token expires at which the \
+            session is no longer handed out.
+        :type margin: `int`
+        """
+
+        self.margin = margin
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, token, domain, project):
+        """Retrieve a scoped session.
+
+        :param token: The `X-Auth-Token` the session was scoped from.
+        :type token: `str`
+        :param domain: Name of the project's domain.
+        :type domain: `str`
+        :param project: Name of the project.
+        :type project: `str`
+        :return: The scoped session or `None`.
+        :rtype: `keystoneauth1.session.Session`
+        """
+
+        return self._cache.get((token, domain, project))
+
+    def put(self, token, domain, project, os_session):
+        """Store a scoped session.
+
+        :param token: The `X-Auth-Token` the session was scoped from.
+        :type token: `str`
+        :param domain: Name of the project's domain.
+        :type domain: `str`
+        :param project: Name of the project.
+        :type project: `str`
+        :param os_session: The authenticated, scoped session.
+        :type os_session: `keystoneauth1.session.Session`
+        :return: The stored session.
+        :rtype: `keystoneauth1.session.Session`
+        """
+
+        expires_at = TokenCache.expires_at(os_session)
+        if expires_at is None:
+            return self._cache.set((token, domain, project), os_session)
+
+        if expires_at - self.margin <= time.time():
+            return os_session
+
+        return self._cache.set((token, domain, project), os_session,
+                               expires_at=expires_at - self.margin)
+
+    def entries(self):
+        """Retrieve a snapshot of the registered sessions.
+
+        :return: The ((token, domain, project), session) pairs.
+        :rtype: `list`
+        """
+
+        return self._cache.items()
+
+    def expiring(self, within):
+        """List the sessions in use whose entries lapse within `within` seconds.
+
+        :param within: Seconds from now.
+        :type within: `int`
+        :return: The ((token, domain, project), session) pairs of the \
+            sessions reused since registered.
+        :rtype: `list`
+        """
+
+        return self._cache.expiring(within)
+
+    def invalidate_token(self, token):
+        """Forget all sessions scoped from a token.
+
+        :param token: The `X-Auth-Token` the sessions were scoped from.
+        :type token: `str`
+        """
+
+        for key, _ in self.entries():
+            if key[0] == token:
+                self._cache.pop(key)
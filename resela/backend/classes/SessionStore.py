@@ -0,0 +1,243 @@
+"""
+SessionStore.py
+***************
+"""
+
+import base64
+import hashlib
+import secrets
+import threading
+
+import flask
+from cryptography.fernet import Fernet, InvalidToken
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+from resela.app import APP
+from resela.backend.classes.TTLCache import TTLCache
+
+_SHARED_STORE = None
+_SHARED_STORE_LOCK = threading.Lock()
+
+
+class MemoryStore:
+    """Key-value store held in the memory of the process.
+
+    Serves a single worker only. Used when no shared store is configured.
+    """
+
+    def __init__(self, maxsize=65536, ttl=3600):
+        """
+        :param maxsize: Maximum number of values held.
+        :type maxsize: `int`
+        :param ttl: Default lifetime of a value, in seconds.
+        :type ttl: `int`
+        """
+
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key):
+        """Retrieve a value, or `None` if missing or expired."""
+
+        return self._cache.get(key)
+
+    def set(self, key, value, ttl=None):
+        """Store a value for `ttl` seconds, or the default lifetime."""
+
+        self._cache.set(key, value, ttl=ttl)
+
+    def delete(self, key):
+        """Remove a value."""
+
+        self._cache.pop(key)
+
+
+class RedisStore:
+    """Key-value store kept in Redis, shared by all workers and hosts.
+
+    Values hold tokens, e.g. the authentication headers of the sessions. Given
+    a secret, they are encrypted with it before leaving the process, so that
+    reading Redis is not enough to act as the users.
+    """
+
+    def __init__(self, client, ttl=3600, prefix='resela:', secret=None):
+        """
+        :param client: A Redis client, or any object offering its `get`, \
+            `setex` and `delete` methods.
+        :type client: `redis.Redis`
+        :param ttl: Default lifetime of a value, in seconds.
+        :type ttl: `int`
+        :param prefix: Prefix of the keys, separating Resela's keys from \
+            those of other applications.
+        :type prefix: `str`
+        :param secret: Secret the values are encrypted with, e.g. the Flask \
+            secret key shared by the workers. Values are stored as is if `None`.
+        :type secret: `str`
+        """
+
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._cipher = None
+        if secret:
+            key = hashlib.sha256(secret.encode('utf-8')).digest()
+            self._cipher = Fernet(base64.urlsafe_b64encode(key))
+
+    @classmethod
+    def from_url(cls, url, ttl=3600, secret=None):
+        """Connect to the Redis server at `url`, e.g. `redis://localhost/0`.
+
+        :raises RuntimeError: If the `redis` package is not installed.
+        """
+
+        if redis is None:
+            raise RuntimeError('The redis session backend requires the '
+                               '`redis` package.')
+        return cls(redis.Redis.from_url(url), ttl=ttl, secret=secret)
+
+    def get(self, key):
+        """Retrieve a value, or `None` if missing or expired."""
+
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        if self._cipher is not None:
+            try:
+                value = self._cipher.decrypt(value)
+            except InvalidToken:
+                # Written in clear or with another secret.
+                return None
+        return value.decode('utf-8')
+
+    def set(self, key, value, ttl=None):
+        """Store a value for `ttl` seconds, or the default lifetime."""
+
+        if self._cipher is not None:
+            value = self._cipher.encrypt(value.encode('utf-8')).decode('ascii')
+        self.client.setex(self.prefix + key, int(ttl or self.ttl), value)
+
+    def delete(self, key):
+        """Remove a value."""
+
+        self.client.delete(self.prefix + key)
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Flask session whose content is kept in a store, keyed by its id."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Session interface keeping only a random session id in the cookie.
+
+    The content of the session lives in the store, so that every worker
+    serving the application sees the same session.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, prefix='session:'):
+        """
+        :param store: The store holding the sessions.
+        :type store: `MemoryStore` or `RedisStore`
+        :param prefix: Prefix of the session keys in the store.
+        :type prefix: `str`
+        """
+
+        self.store = store
+        self.prefix = prefix
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.get(self.prefix + sid)
+            if data is not None:
+                return ServerSideSession(self.serializer.loads(data), sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified:
+                self.store.delete(self.prefix + session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        self.store.set(self.prefix + session.sid,
+                       self.serializer.dumps(dict(session)))
+        response.set_cookie(name, session.sid,
+                            expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app),
+                            domain=domain, path=path,
+                            secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
+
+
+def regenerate(session):
+    """Move a server-side session to a new id, e.g. upon login.
+
+    The content is kept under a new random id and the old id is forgotten,
+    so that an id planted in the cookie before login is of no use after.
+    Cookie sessions hold no id and are left as they are.
+
+    :param session: The session of the request, e.g. `flask.session`.
+    """
+
+    if not isinstance(session, ServerSideSession):
+        return
+
+    interface = flask.current_app.session_interface
+    interface.store.delete(interface.prefix + session.sid)
+    session.sid = secrets.token_urlsafe(32)
+    session.modified = True
+
+
+def shared_store():
+    """Retrieve the store shared by the workers, as configured in `[session]`.
+
+    With the `redis` backend, sessions, validated tokens and scoped sessions
+    are kept in Redis and shared by all workers, encrypted with the Flask
+    secret key. With the `memory` and
+    `cookie` backends, they are kept in the memory of the process.
+
+    :return: The shared store.
+    :rtype: `MemoryStore` or `RedisStore`
+    """
+
+    global _SHARED_STORE
+
+    if _SHARED_STORE is None:
+        with _SHARED_STORE_LOCK:
+            if _SHARED_STORE is None:
+                config = APP.iniconfig['session']
+                if config.get('backend') == 'redis':
+                    _SHARED_STORE = RedisStore.from_url(
+                        config.get('redis_url'), ttl=config.getint('lifetime'),
+                        secret=APP.iniconfig.get('flask', 'secret_key'))
+                else:
+                    _SHARED_STORE = MemoryStore(
+                        maxsize=config.getint('memory_size'),
+                        ttl=config.getint('lifetime'))
+    return _SHARED_STORE
@@ -0,0 +1,251 @@
+"""
+StatusWatcher.py
+****************
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from resela.app import APP
+
+LOG = logging.getLogger(__name__)
+
+# Factor by which the polling interval of a source grows while nothing it
+# watches changes.
+BACKOFF = 1.5
+
+_STATUS_WATCHER = None
+_STATUS_WATCHER_LOCK = threading.Lock()
+
+
+class _Watch:
+    """A resource waited for, the listing of its caller, and the future
+    completed with its status."""
+
+    def __init__(self, list_statuses, resource_id, expected, stop, gone, deadline):
+        self.list_statuses = list_statuses
+        self.resource_id = resource_id
+        self.expected = expected
+        self.stop = stop
+        self.gone = gone
+        self.deadline = deadline
+        self.status = None
+        self.future = Future()
+
+
+class _Source:
+    """The resources listed together, e.g. the servers of a project."""
+
+    def __init__(self, interval):
+        self.watches = []
+        self.interval = interval
+        self.due = time.time()
+        self.polling = False
+
+
+class StatusWatcher:
+    """Waits for resources, e.g. servers or images, to reach a status.
+
+    A thread schedules the polls, which run on a pool of `workers` threads so
+    that a slow source does not delay the others. The resources of a source,
+    e.g. the servers of a project, are polled together with one listing,
+    however many callers wait for them. The listing of the latest caller is
+    used, falling back to the listings of the others if its token is
+    rejected. The interval between
+    two polls of a source starts at `min_interval` and grows up to
+    `max_interval` while none of its resources changes status.
+
+    Callers get a `Future` completed with the status of the resource once it
+    reaches the expected status or a stop status, or once it timed out. It
+    fails with the error of the listing if that still fails at the deadline.
+    """
+
+    def __init__(self, min_interval=1, max_interval=10, timeout=360, workers=4):
+        """
+        :param min_interval: Seconds between two polls after a change.
+        :type min_interval: `float`
+        :param max_interval: Longest number of seconds between two polls.
+        :type max_interval: `float`
+        :param timeout: Default number of seconds a resource is waited for.
+        :type timeout: `float`
+        :param workers: Number of sources polled at the same time.
+        :type workers: `int`
+        """
+
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self._sources = {}
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1),
+                                            thread_name_prefix='resela-status-poll')
+
+    def watch(self, source, list_statuses, resource_id, expected, stop=(), gone=None,
+              timeout=-1):
+        """Wait for a resource to reach a status.
+
+        :param source: Key of the source, resources of the same source are \
+            listed together.
+        :param list_statuses: Function called with a list of resource ids, \
+            returning the status of each existing one keyed by id.
+        :type list_statuses: `function`
+        :param resource_id: Id of the resource.
+        :type resource_id: `str`
+        :param expected: Status waited for, e.g. `ACTIVE`.
+        :type expected: `str`
+        :param stop: Statuses ending the wait as well, e.g. `ERROR`.
+        :type stop: iterable of `str`
+        :param gone: Status of a resource not listed, e.g. `DELETED`.
+        :type gone: `str`
+        :param timeout: Seconds after which the wait ends with the last \
+            status seen, `None` to wait forever. The default timeout if \
+            negative.
+        :type timeout: `float`
+        :return: Future completed with the status.
+        :rtype: `concurrent.futures.Future`
+        """
+
+        if timeout is not None and timeout < 0:
+            timeout = self.timeout
+        deadline = None if timeout is None else time.time() + timeout
+        watch = _Watch(list_statuses, resource_id, expected, frozenset(stop), gone,
+                       deadline)
+
+        with self._condition:
+            entry = self._sources.get(source)
+            if entry is None:
+                entry = self._sources[source] = _Source(self.min_interval)
+            else:
+                entry.interval = self.min_interval
+                entry.due = min(entry.due, time.time() + self.min_interval)
+            entry.watches.append(watch)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='resela-status',
+                                                daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+        return watch.future
+
+    def wait(self, *args, **kwargs):
+        """Wait for a resource to reach a status, blocking until it does.
+
+        Takes the arguments of `watch`.
+
+        :return: The status of the resource.
+        :rtype: `str`
+        """
+
+        return self.watch(*args, **kwargs).result()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                now = time.time()
+                idle = [source for source in self._sources.values() if not source.polling]
+                due = [(key, source) for key, source in self._sources.items()
+                       if not source.polling and source.due <= now]
+                if not due:
+                    # A source being polled is rescheduled once its poll ends.
+                    self._condition.wait(
+                        min((source.due for source in idle), default=now + 60) - now)
+                    continue
+                for _, source in due:
+                    source.polling = True
+
+            for key, source in due:
+                self._executor.submit(self._poll_source, key, source)
+
+    def _poll_source(self, key, source):
+        try:
+            self._poll(key, source)
+        except Exception:
+            LOG.exception('Unable to poll %s.', key)
+        finally:
+            with self._condition:
+                source.polling = False
+                self._condition.notify()
+
+    def _poll(self, key, source):
+        with self._condition:
+            watches = [watch for watch in source.watches if not watch.future.done()]
+        ids = sorted({watch.resource_id for watch in watches})
+
+        # The listings of the callers, latest first, each with its own token.
+        listings = list(dict.fromkeys(watch.list_statuses for watch in reversed(watches)))
+        statuses = None if ids else {}
+        error = None
+        for list_statuses in listings if ids else ():
+            try:
+                statuses = list_statuses(ids)
+                break
+            except Exception as exception:
+                error = exception
+                if not _unauthorized(exception):
+                    break
+        if statuses is None:
+            LOG.warning('Unable to list the statuses of %s.', key, exc_info=error)
+
+        now = time.time()
+        changed = False
+        for watch in watches:
+            if statuses is not None:
+                status = statuses.get(watch.resource_id, watch.gone)
+                changed = changed or status != watch.status
+                watch.status = status
+                if status == watch.expected or status in watch.stop:
+                    self._complete(watch, status)
+                    continue
+            if watch.deadline is not None and now >= watch.deadline:
+                if error is not None:
+                    self._complete(watch, error=error)
+                else:
+                    self._complete(watch, watch.status)
+
+        with self._condition:
+            source.watches = [watch for watch in source.watches if not watch.future.done()]
+            if not source.watches:
+                del self._sources[key]
+                return
+            source.interval = self.min_interval if changed else \
+                min(source.interval * BACKOFF, self.max_interval)
+            source.due = now + source.interval
+
+    @staticmethod
+    def _complete(watch, status=None, error=None):
+        # The future may have been cancelled by the caller.
+        if watch.future.set_running_or_notify_cancel():
+            if error is not None:
+                watch.future.set_exception(error)
+            else:
+                watch.future.set_result(status)
+
+
+def _unauthorized(exception):
+    """Tell whether a listing failed because its token was rejected."""
+
+    return 401 in (getattr(exception, 'http_status', None), getattr(exception, 'code', None))
+
+
+def status_watcher():
+    """Retrieve the process-wide status watcher.
+
+    :rtype: `StatusWatcher`
+    """
+
+    global _STATUS_WATCHER
+
+    if _STATUS_WATCHER is None:
+        with _STATUS_WATCHER_LOCK:
+            if _STATUS_WATCHER is None:
+                config = APP.iniconfig['openstack']
+                _STATUS_WATCHER = StatusWatcher(
+                    min_interval=config.getfloat('status_min_interval'),
+                    max_interval=config.getfloat('status_max_interval'),
+                    timeout=config.getfloat('status_timeout'),
+                    workers=config.getint('status_workers'))
+    return _STATUS_WATCHER
@@ -0,0 +1,130 @@
+"""
+TTLCache.py
+***********
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """A thread safe key-value store with expiring entries.
+
+    The cache holds at most `maxsize` entries. When full, the least recently
+    used entry is evicted. Every entry expires `ttl` seconds after it was set,
+    or earlier if an explicit deadline is given.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        """
+        :param maxsize: Maximum number of entries held.
+        :type maxsize: `int`
+        :param ttl: Default lifetime of an entry, in seconds.
+        :type ttl: `int` or `float`
+        """
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        """Retrieve an entry, or `default` if it is missing or expired.
+
+        :param key: Key of the entry.
+        :param default: Value returned on a miss.
+        :return: The cached value or `default`.
+        """
+
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] <= time.time():
+                del self._data[key]
+                item = None
+
+            if item is None:
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            item[2] = True
+            return item[0]
+
+    def set(self, key, value, ttl=None, expires_at=None):
+        """Store an entry.
+
+        :param key: Key of the entry.
+        :param value: Value to store.
+        :param ttl: Lifetime overriding the default lifetime, in seconds.
+        :type ttl: `int` or `float`
+        :param expires_at: Absolute deadline (UNIX time) after which the entry \
+            is discarded, if it comes before the end of its lifetime.
+        :type expires_at: `float`
+        :return: The stored value.
+        """
+
+        deadline = time.time() + (self.ttl if ttl is None else ttl)
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+
+        with self._lock:
+            # The value, its deadline, and whether it was read since.
+            self._data[key] = [value, deadline, False]
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+        return value
+
+    def pop(self, key, default=None):
+        """Remove an entry and return its value, or `default` if missing."""
+
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self):
+        """Remove all entries."""
+
+        with self._lock:
+            self._data.clear()
+
+    def items(self):
+        """List the unexpired entries.
+
+        :return: A snapshot of the (key, value) pairs.
+        :rtype: `list` of `tuple`
+        """
+
+        now = time.time()
+        with self._lock:
+            return [(key, item[0]) for key, item in self._data.items()
+                    if item[1] > now]
+
+    def expiring(self, within):
+        """List the entries read since they were set that expire within
+        `within` seconds, e.g. to renew them before they lapse.
+
+        :param within: Seconds from now.
+        :type within: `int` or `float`
+        :return: A snapshot of the (key, value) pairs.
+        :rtype: `list` of `tuple`
+        """
+
+        now = time.time()
+        with self._lock:
+            return [(key, item[0]) for key, item in self._data.items()
+                    if now < item[1] <= now + within and item[2]]
+
+    def __contains__(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[1] > time.time()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
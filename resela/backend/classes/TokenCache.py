@@ -0,0 +1,119 @@
+"""
+TokenCache.py
+*************
+"""
+
+import time
+from collections import namedtuple
+
+from resela.backend.classes.TTLCache import TTLCache
+
+CachedToken = namedtuple('CachedToken', ('session', 'profile', 'role', 'expires_at',
+                                         'issued_at'))
+
+
+class TokenCache:
+    """Cache of validated Keystone tokens.
+
+    Maps an `X-Auth-Token` to the authenticated session it was validated
+    with, together with the profile and role of its user, so that loading
+    the current user does not need any Keystone calls while the token is
+    valid.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, margin=60):
+        """
+        :param maxsize: Maximum number of tokens held.
+        :type maxsize: `int`
+        :param ttl: Seconds after which a token is validated again.
+        :type ttl: `int`
+        :param margin: Seconds before the token expires at which it is no \
+            longer handed out.
+        :type margin: `int`
+        """
+
+        self.margin = margin
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def expires_at(os_session):
+        """Retrieve the expiry time of the token held by a session.
+
+        :param os_session: An authenticated session.
+        :type os_session: `keystoneauth1.session.Session`
+        :return: The expiry time as a UNIX timestamp, or `None` if unknown.
+        :rtype: `float`
+        """
+
+        auth_ref = getattr(os_session.auth, 'auth_ref', None)
+        expires = getattr(auth_ref, 'expires', None)
+        return expires.timestamp() if expires is not None else None
+
+    def get(self, token):
+        """Retrieve a validated token.
+
+        :param token: The `X-Auth-Token` value.
+        :type token: `str`
+        :return: The cached entry or `None`.
+        :rtype: `CachedToken`
+        """
+
+        return self._cache.get(token)
+
+    def put(self, token, os_session, profile, role, issued_at=None):
+        """Store a validated token.
+
+        :param token: The `X-Auth-Token` value.
+        :type token: `str`
+        :param os_session: The session the token was validated with.
+        :type os_session: `keystoneauth1.session.Session`
+        :param profile: The user attributes, as passed to `model.User`.
+        :type profile: `dict`
+        :param role: The role of the user.
+        :type role: `str`
+        :param issued_at: When the profile and role were read, now if not \
+            given.
+        :type issued_at: `float`
+        :return: The stored entry.
+        :rtype: `CachedToken`
+        """
+
+        expires_at = self.expires_at(os_session)
+        entry = CachedToken(os_session, dict(profile), role, expires_at,
+                            time.time() if issued_at is None else issued_at)
+
+        if expires_at is None:
+            return self._cache.set(token, entry)
+
+        if expires_at - self.margin <= time.time():
+            # Do not cache a token that would be unusable at once.
+            return entry
+
+        return self._cache.set(token, entry, expires_at=expires_at - self.margin)
+
+    def expiring(self, within):
+        """List the tokens in use whose entries lapse within `within` seconds.
+
+        :param within: Seconds from now.
+        :type within: `int`
+        :return: The (token, entry) pairs of the tokens read since stored.
+        :rtype: `list`
+        """
+
+        return self._cache.expiring(within)
+
+    def invalidate(self, token):
+        """Forget a token, e.g. upon logout."""
+
+        self._cache.pop(token)
+
+    def invalidate_user(self, user_id):
+        """Forget all tokens belonging to a user.
+
+        :param user_id: OpenStack id of the user.
+        :type user_id: `str`
+        """
+
+        for token, entry in self._cache.items():
+            if entry.profile.get('user_id') == user_id:
+                self._cache.pop(token)
@@ -0,0 +1,114 @@
+"""
+TokenRefresher.py
+*****************
+"""
+
+import logging
+import threading
+import time
+
+from resela.backend.classes.TokenCache import TokenCache
+
+LOG = logging.getLogger(__name__)
+
+
+class TokenRefresher(threading.Thread):
+    """Background thread renewing the cached sessions of active users.
+
+    Every `interval` seconds, one pass is made over the token cache and the
+    session registry. The entries read since they were stored, whose cache
+    lifetime ends within `window` seconds, are scoped anew from their
+    still-valid token and stored again, so that the next request of their
+    user is served from the cache instead of waiting for Keystone. A revoked
+    token fails to scope and is forgotten.
+
+    No password is kept for this. As Keystone never issues a token outliving
+    the one it is derived from, sessions whose token itself expires within
+    the window are left to lapse, and their users log in again.
+    """
+
+    def __init__(self, tokens, sessions, rescope, interval=60, window=90):
+        """
+        :param tokens: The cache of validated tokens.
+        :type tokens: `TokenCache`
+        :param sessions: The registry of project scoped sessions.
+        :type sessions: `SessionRegistry`
+        :param rescope: Function scoping a token to a project without \
+            looking at any cache, called as `rescope(token, domain, project)` \
+            and returning a session. The default project when not given.
+        :type rescope: `function`
+        :param interval: Seconds between two passes.
+        :type interval: `int`
+        :param window: Seconds before the end of their cache lifetime from \
+            which entries are renewed.
+        :type window: `int`
+        """
+
+        super().__init__(name='TokenRefresher', daemon=True)
+        self.tokens = tokens
+        self.sessions = sessions
+        self.rescope = rescope
+        self.interval = interval
+        self.window = window
+        self._stopped = threading.Event()
+
+    def _lapsing(self, os_session, now):
+        """Check whether the token of a session itself expires within the window."""
+
+        expires_at = TokenCache.expires_at(os_session)
+        return expires_at is not None and \
+            expires_at - self.tokens.margin <= now + self.window
+
+    def refresh(self):
+        """Make one pass, renewing the entries about to lapse.
+
+        :return: The number of entries renewed.
+        :rtype: `int`
+        """
+
+        now = time.time()
+        renewed = 0
+
+        for token, entry in self.tokens.expiring(self.window):
+            if self._lapsing(entry.session, now):
+                continue
+            try:
+                os_session = self.rescope(token)
+            except Exception:
+                LOG.warning('Unable to renew the token of user %s.',
+                            entry.profile.get('user_id'), exc_info=True)
+                self.tokens.invalidate(token)
+                continue
+            # Still as old as the profile it holds.
+            self.tokens.put(token, os_session, entry.profile, entry.role, entry.issued_at)
+            renewed += 1
+
+        for (token, domain, project), scoped in self.sessions.expiring(self.window):
+            if self._lapsing(scoped, now):
+                continue
+            try:
+                # Registered again by `rescope`.
+                self.rescope(token, domain, project)
+            except Exception:
+                LOG.warning('Unable to scope a token to %s anew.', project,
+                            exc_info=True)
+                continue
+            renewed += 1
+
+        if renewed:
+            LOG.debug('Renewed %d sessions in %.3f s.', renewed, time.time() - now)
+        return renewed
+
+    def run(self):
+        """Make a pass every `interval` seconds until stopped."""
+
+        while not self._stopped.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                LOG.exception('Token refresh pass failed.')
+
+    def stop(self):
+        """Stop the thread after its current pass."""
+
+        self._stopped.set()
@@ -3,23 +3,59 @@ CourseManager.py
 ****************
 """
 
-from keystoneclient.v3.client import Client as KeystoneClient
+import threading
+
 from keystoneclient.v3.domains import DomainManager
 
 from flask_login import current_user
 
+from resela.app import APP
+from resela.backend.classes.ClientFactory import ClientFactory
+from resela.backend.classes.KeystoneCatalog import cached_find, cached_get
+from resela.backend.classes.RequestCache import request_memoized
+from resela.backend.classes.TTLCache import TTLCache
 from resela.backend.managers.InstanceManager import InstanceManager
 from resela.backend.managers.ManagerException import CourseManagerCreationFail
 from resela.backend.managers.RoleManager import ROLES
 
 IGNORE_COURSES = ('Default', 'default', 'heat', 'imageLibrary', 'snapshotFactory')
 
+_MEMBERSHIP_CACHE = None
+_MEMBERSHIP_CACHE_LOCK = threading.Lock()
+
+
+def membership_cache():
+    """Retrieve the process-wide index of course memberships.
+
+    :return: The memberships of each user, keyed by user id, see \
+        `CourseManager.memberships`.
+    :rtype: `TTLCache`
+    """
+
+    global _MEMBERSHIP_CACHE
+
+    if _MEMBERSHIP_CACHE is None:
+        with _MEMBERSHIP_CACHE_LOCK:
+            if _MEMBERSHIP_CACHE is None:
+                _MEMBERSHIP_CACHE = TTLCache(
+                    maxsize=4096, ttl=APP.iniconfig['openstack'].getint('membership_ttl'))
+    return _MEMBERSHIP_CACHE
+
+
+def forget_memberships(user_id):
+    """Forget the memberships of a user, after adding or removing him or her from a group.
+
+    :param user_id: The id of the user.
+    :type user_id: str
+    """
+    membership_cache().pop(user_id)
+
 
 class CourseManager(DomainManager):
     """Represents a Openstack domain manager"""
     def __init__(self, session=None, client=None):
         if session:
-            client = KeystoneClient(session=session)
+            client = ClientFactory.keystone(session)
         if client:
             super().__init__(client)
         else:
@@ -27,6 +63,19 @@ class CourseManager(DomainManager):
 
         self._client = client
 
+    @request_memoized('course')
+    def get(self, domain, **kwargs):
+        """Read a course once per request, through the Keystone catalog, see `request_memoized`."""
+        if kwargs:
+            return super().get(domain, **kwargs)
+        return cached_get(self, 'domain', domain, super().get)
+
+    def find(self, **kwargs):
+        """Find a course, by name through the Keystone catalog."""
+        if list(kwargs) != ['name']:
+            return super().find(**kwargs)
+        return cached_find(self, 'domain', kwargs['name'], super().find)
+
     def list_courses(self, **kwargs):
         """ List OpenStack domains that are actual courses.
         
@@ -79,6 +128,52 @@ class CourseManager(DomainManager):
 
         return course.id
 
+    def memberships(self, user_id, fresh=False):
+        """
+        Return the courses of a user along with his or her role in each,
+        read from one listing of the user's groups and cached per user.
+
+        The cache is only forgotten by the worker changing a membership, so
+        access decisions read the memberships fresh.
+
+        Course groups are named `<course>|<role>s`. Other groups than the
+        global `students` and `teachers` groups, e.g. `admin`, count as a
+        membership of their domain without a course name.
+
+        :param user_id: A user to filter by
+        :type user_id: str
+        :param fresh: Whether to list the groups again rather than use the cache
+        :type fresh: bool
+
+        :return Course name and role, keyed by course ID
+        :rtype dict
+        """
+        memberships = None if fresh else membership_cache().get(user_id)
+        if memberships is None:
+            memberships = {}
+            for group in self._client.groups.list(user=user_id):
+                if '|' in group.name:
+                    name, role = group.name.split('|', 1)
+                    memberships[group.domain_id] = (name, role.rstrip('s'))
+                elif group.name not in ('students', 'teachers'):
+                    memberships.setdefault(group.domain_id, (None, group.name))
+            membership_cache().set(user_id, memberships)
+        return memberships
+
+    def courses_for_users(self, user_ids):
+        """
+        Return the memberships of several users, see `memberships`.
+
+        :param user_ids: Users to filter by
+        :type user_ids: iterable of str
+
+        :return Role in each course, keyed by user ID then course ID
+        :rtype dict
+        """
+        return {user_id: {course_id: role for course_id, (_, role)
+                          in self.memberships(user_id).items()}
+                for user_id in user_ids}
+
     def get_course_names(self, user_id):
         """
         Return a list of all course names, extracted from a user's group
@@ -90,8 +185,7 @@ class CourseManager(DomainManager):
         :return List of course name which the user is part of
         :rtype List
         """
-        return [group.name.split('|')[0] for group in
-                self._client.groups.list(user=user_id) if '|' in group.name]
+        return [name for name, _ in self.memberships(user_id).values() if name]
 
     def check_in_course(self, user_id, course_id):
         """Check if a specified user in a specific course.
@@ -104,11 +198,8 @@ class CourseManager(DomainManager):
         :return True or false depending on whether the user is in the course
         :rtype boolean
         """
-        #TODO: This function does not work (_client fails)
-        user_groups = [group for group in self._client.groups.list(user=user_id) if
-                       group.name not in ('students', 'teachers')]
-
-        return any(group.domain_id == course_id for group in user_groups)
+        # An access decision, never taken on memberships cached by this worker.
+        return course_id in self.memberships(user_id, fresh=True)
 
     def add_user(self, course_id, email, role):
         """This will add a list of users to a course. The users needs to be in the system before added
@@ -136,6 +227,7 @@ class CourseManager(DomainManager):
         # fail.
         user = user_m.find(name=email)
         user_m.add_to_group(user=user, group=group.id)
+        forget_memberships(user.id)
 
     def remove_user(self, user_id, course_id, role):
         """Will remove a user from a course. Will remove the users instances on the course!
@@ -196,5 +288,6 @@ class CourseManager(DomainManager):
                 user_m.remove_from_group(user=user_m.get(user_id),
                                          group=group.id)
 
+        forget_memberships(user_id)
         return True
 
@@ -4,6 +4,8 @@ from functools import wraps, partial
 from flask import render_template, jsonify, abort
 from jinja2.exceptions import TemplateError
 from keystoneauth1.exceptions.base import ClientException as ksc_exception
+from keystoneauth1.exceptions.catalog import EndpointNotFound
+from keystoneauth1.exceptions.connection import ConnectFailure
 from keystoneauth1.exceptions.http import NotFound, Conflict, Forbidden
 from novaclient.exceptions import ClientException as nc_exception
 
@@ -156,6 +158,14 @@ def error_handling(func, log, api_call=False):
             if not api_call:
                 abort(409)
             return respond(**respond_arguments)
+        except (EndpointNotFound, ConnectFailure) as error:
+            # The cached endpoints may be stale, discover them anew.
+            from resela.backend.classes.ServiceCatalog import service_catalog
+            service_catalog().refresh()
+            msg = 'Unsuccessful OpenStack call.'
+            respond_arguments[msg_key] = msg
+            log.exception(msg)
+            return respond(**respond_arguments)
         except (ksc_exception, nc_exception) as error:
             msg = 'Unsuccessful OpenStack call.'
             respond_arguments[msg_key] = msg
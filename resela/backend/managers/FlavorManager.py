@@ -3,8 +3,13 @@ FlavorManager.py
 ****************
 """
 
-from novaclient.client import Client as NovaClient
+import copy
+
 from novaclient.v2.flavors import FlavorManager as OSFlavorManager
+
+from resela.backend.classes.ClientFactory import ClientFactory
+from resela.backend.classes.FlavorCatalog import flavor_catalog
+from resela.backend.classes.RequestCache import request_memoized
 from resela.backend.managers.ManagerException import FlavorManagerCreationFail
 
 
@@ -12,10 +17,54 @@ class FlavorManager(OSFlavorManager):
     """Represents a openstack flavor manager"""
     def __init__(self, session=None, client=None):
         if session:
-            client = NovaClient(version='2', session=session)
+            client = ClientFactory.nova(session)
         if client:
             super().__init__(client)
         else:
             raise FlavorManagerCreationFail("Neither session nor client provided")
 
         self._client = client
+
+    @request_memoized('flavors')
+    def list(self, *args, **kwargs):
+        """Read the list of flavors through the flavor catalog, see `request_memoized`."""
+        catalog = flavor_catalog()
+        if catalog is None or args or kwargs:
+            return super().list(*args, **kwargs)
+        catalog.refresh(super().list)
+        return self._flavors(catalog.all())
+
+    def _flavors(self, infos):
+        """ Return flavor objects bound to this manager for catalog entries """
+        return [self.resource_class(self, copy.deepcopy(info), loaded=True) for info in infos]
+
+    def find(self, **kwargs):
+        """Find a flavor, by name through the flavor catalog."""
+        catalog = flavor_catalog()
+        if catalog is None or list(kwargs) != ['name']:
+            return super().find(**kwargs)
+        self.list()
+        info = catalog.find(kwargs['name'])
+        if info is None:
+            return super().find(**kwargs)
+        return self._flavors([info])[0]
+
+    def by_name(self):
+        """ Return the flavors keyed by name, read with one listing
+        :return: flavors keyed by name
+        """
+        return {flavor.name: flavor for flavor in self.list()}
+
+    def at_least(self, disk=0, ram=0):
+        """ Return the flavors with at least the given disk and RAM, smallest first
+        :param disk: minimum disk, in GB
+        :param ram: minimum RAM, in MB
+        :return: list of flavors
+        """
+        catalog = flavor_catalog()
+        if catalog is None:
+            return sorted((flavor for flavor in self.list()
+                           if flavor.disk >= disk and flavor.ram >= ram),
+                          key=lambda flavor: (flavor.disk, flavor.ram))
+        catalog.refresh(super().list)
+        return self._flavors(catalog.at_least(disk=disk, ram=ram))
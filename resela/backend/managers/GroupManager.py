@@ -3,8 +3,10 @@ GroupManager.py
 ***************
 """
 
-from keystoneclient.v3.client import Client as KeystoneClient
 from keystoneclient.v3.groups import GroupManager as OSGroupManager
+from resela.backend.classes.ClientFactory import ClientFactory
+from resela.backend.classes.KeystoneCatalog import cached_find, cached_get
+from resela.backend.classes.RequestCache import request_memoized
 from resela.backend.managers.ManagerException import GroupManagerCreationFail
 
 
@@ -12,10 +14,28 @@ class GroupManager(OSGroupManager):
     """Represents a openstack group manager"""
     def __init__(self, session=None, client=None):
         if session:
-            client = KeystoneClient(session=session)
+            client = ClientFactory.keystone(session)
         if client:
             super().__init__(client)
         else:
             raise GroupManagerCreationFail("Neither session nor client provided")
 
         self._client = client
+
+    @request_memoized('group')
+    def get(self, group, **kwargs):
+        """Read a group once per request, through the Keystone catalog, see `request_memoized`."""
+        if kwargs:
+            return super().get(group, **kwargs)
+        return cached_get(self, 'group', group, super().get)
+
+    def find(self, **kwargs):
+        """Find a group, by name through the Keystone catalog."""
+        if list(kwargs) != ['name']:
+            return super().find(**kwargs)
+        return cached_find(self, 'group', kwargs['name'], super().find)
+
+    @request_memoized('groups')
+    def list(self, *args, **kwargs):
+        """Read the list of groups once per request, see `request_memoized`."""
+        return super().list(*args, **kwargs)
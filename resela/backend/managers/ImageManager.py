@@ -3,19 +3,195 @@ ImageManager.py
 ***************
 """
 
-from glanceclient.client import Client as GlanceClient
+import logging
+import threading
+
+import flask
+from flask_login import current_user
+from glanceclient.exc import HTTPException, HTTPNotFound
 from glanceclient.v2.images import Controller
+from resela.app import APP
+from resela.backend.classes.ClientFactory import ClientFactory
+from resela.backend.classes.ImageSearchIndex import image_search_indexes
+from resela.backend.classes.RequestCache import request_memoized
+from resela.backend.classes.StatusWatcher import status_watcher
+from resela.backend.classes.TTLCache import TTLCache
 from resela.backend.managers.ManagerException import ImageManagerCreationFail
 
+LOG = logging.getLogger(__name__)
+
+_CREDENTIALS_CACHE = None
+_CREDENTIALS_CACHE_LOCK = threading.Lock()
+
+
+def credentials_cache():
+    """Retrieve the process-wide cache of image login credentials.
+
+    :return: The (username, password) pairs, keyed by project, user and image id.
+    :rtype: `TTLCache`
+    """
+
+    global _CREDENTIALS_CACHE
+
+    if _CREDENTIALS_CACHE is None:
+        with _CREDENTIALS_CACHE_LOCK:
+            if _CREDENTIALS_CACHE is None:
+                _CREDENTIALS_CACHE = TTLCache(
+                    maxsize=1024,
+                    ttl=APP.iniconfig['resela'].getint('image_credentials_ttl'))
+    return _CREDENTIALS_CACHE
+
+
+def forget_credentials(image_id):
+    """Forget the cached credentials of a image, in every project."""
+
+    cache = credentials_cache()
+    for key, _ in cache.items():
+        if key[2] == image_id:
+            cache.pop(key)
+
 
 class ImageManager(Controller):
     """Represents a openstack image manager"""
     def __init__(self, session=None, client=None):
         if session:
-            client = GlanceClient(version='2', session=session)
+            client = ClientFactory.glance(session)
         if client:
             super().__init__(client.http_client, client.schemas)
         else:
             raise ImageManagerCreationFail("Neither session or client provided.")
 
+        self.session = session
         self._client = client
+
+    @request_memoized('image')
+    def get(self, *args, **kwargs):
+        """Read a image once per request, see `request_memoized`."""
+        return super().get(*args, **kwargs)
+
+    def get_many(self, image_ids):
+        """ Return the images with the ids, read with one listing
+        Glance filters the listing by id with the in: operator. Images it does not list, e.g.
+        when the operator is not supported, are read one by one.
+        :return: images keyed by id
+        """
+
+        wanted = list(dict.fromkeys(image_ids))
+        images = {}
+        if len(wanted) > 1:
+            try:
+                images = {image.id: image for image in
+                          self.list(filters={'id': 'in:' + ','.join(wanted)})
+                          if image.id in wanted}
+            except HTTPException:
+                LOG.warning('Unable to list images by id, reading them one by one.')
+        for image_id in wanted:
+            if image_id not in images:
+                images[image_id] = self.get(image_id)
+        return images
+
+    def wait_for_status(self, image_id, expected_status='active', timeout=-1):
+        """ Wait for a image to reach a status, e.g. a snapshot to be built
+        The image is polled by the status watcher, along with every other image waited for
+        in the project.
+        :return: the status once expected, killed or deleted, or after timeout
+        """
+        return status_watcher().wait(('image', self._project()), self._statuses, image_id,
+                                     expected_status, stop=('killed', 'deleted'),
+                                     gone='deleted', timeout=timeout)
+
+    def _project(self):
+        """The project listed by this manager, the manager itself without a session."""
+        return self.session.get_project_id() if self.session is not None else id(self)
+
+    def _statuses(self, image_ids):
+        """ Return the status of the images, read with one listing
+        Images Glance does not list are read one by one.
+        :return: statuses keyed by id, without the images not found
+        """
+
+        wanted = list(image_ids)
+        statuses = {}
+        try:
+            statuses = {image.id: image.status for image in
+                        self.list(filters={'id': 'in:' + ','.join(wanted)})
+                        if image.id in wanted}
+        except HTTPException:
+            LOG.warning('Unable to list images by id, reading them one by one.')
+        for image_id in wanted:
+            if image_id not in statuses:
+                try:
+                    statuses[image_id] = self.get(image_id, fresh=True).status
+                except HTTPNotFound:
+                    pass
+        return statuses
+
+    @staticmethod
+    def _reindex(image):
+        """ Index a image for the role of the current user, who sees it
+        Other roles may not see the image, so their indexes are rebuilt from their own listing
+        upon their next search instead.
+        """
+
+        scope = current_user.role if flask.has_request_context() else None
+        for role, index in image_search_indexes().items():
+            if role == scope:
+                index.add(image)
+            else:
+                index.invalidate()
+
+    def create(self, **kwargs):
+        """Create a image, adding it to the search indexes."""
+        image = super().create(**kwargs)
+        self._reindex(image)
+        return image
+
+    def upload(self, image_id, image_data, *args, **kwargs):
+        """Upload the data of a image, reindexing it along with its checksum."""
+        result = super().upload(image_id, image_data, *args, **kwargs)
+        self._reindex(self.get(image_id, fresh=True))
+        return result
+
+    def with_checksum(self, checksum):
+        """ Return the images whose data has a MD5 checksum, filtered by Glance
+        The checksums are compared here as well, in case Glance ignores the filter.
+        :return: list of images
+        """
+
+        try:
+            images = list(self.list(filters={'checksum': checksum}))
+        except HTTPException:
+            LOG.warning('Unable to list images by checksum, comparing every image.')
+            images = self.list()
+        return [image for image in images if image.checksum == checksum]
+
+    def update(self, image_id, *args, **kwargs):
+        """Update a image, forgetting its cached credentials and reindexing it."""
+        forget_credentials(image_id)
+        image = super().update(image_id, *args, **kwargs)
+        self._reindex(image)
+        return image
+
+    def delete(self, image_id):
+        """Delete a image, forgetting its cached credentials and removing it from the indexes."""
+        forget_credentials(image_id)
+        result = super().delete(image_id)
+        for index in image_search_indexes().values():
+            index.remove(image_id)
+        return result
+
+    def credentials(self, image_id):
+        """ Return the username and password of instances of a image
+        Cached for image_credentials_ttl seconds, as these rarely change, per project and
+        user, so that only those Glance showed the image to are handed its credentials.
+        :return: (username, password), empty strings if not set on the image
+        """
+
+        user_id = self.session.get_user_id() if self.session is not None else None
+        key = (self._project(), user_id, image_id)
+        credentials = credentials_cache().get(key)
+        if credentials is None:
+            image = self.get(image_id)
+            credentials = credentials_cache().set(
+                key, (getattr(image, 'username', ''), getattr(image, 'password', '')))
+        return credentials
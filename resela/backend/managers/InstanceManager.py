@@ -3,18 +3,27 @@ InstanceManager.py
 ******************
 """
 
-import time
+import copy
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
 
 import flask
 from flask_login import current_user
 from keystoneauth1 import exceptions as ksa_exceptions
-from novaclient.client import Client as NovaClient
+from novaclient import exceptions as nova_exceptions
 from novaclient.v2.servers import ServerManager as OSServerManager
 
 from resela.app import APP
 from resela.app import DATABASE
 from resela.backend.SqlOrm.User import User as UserModel
 from resela.backend.SqlOrm.Vlan import Vlan as VlanModel
+from resela.backend.classes.ClientFactory import ClientFactory
+from resela.backend.classes.RequestCache import request_memoized
+from resela.backend.classes.SecurityGroupHandler import SecurityGroupHandler
+from resela.backend.classes.ServerInventory import server_inventory
+from resela.backend.classes.StatusWatcher import status_watcher
 from resela.backend.classes.NetworkHandler import NetworkHandler
 from resela.backend.managers.ManagerException import InstanceManager404
 from resela.backend.managers.ManagerException import InstanceManagerAnotherActiveLab
@@ -25,11 +34,42 @@ from resela.backend.managers.ManagerException import InstanceManagerTooManyLabs
 from resela.backend.managers.ManagerException import InstanceManagerUnknownFault
 from resela.backend.managers.MikrotikManager import MikrotikManager
 
+LOG = logging.getLogger(__name__)
+
 
 # Refer to
 # https://developer.openstack.org/api-ref/compute/?expanded=list-servers-detail#listServers
 # for a list of available options for the `search_opt` argument of `list()`.
 
+# Semaphores of the users and labs launching instances, with the number of
+# threads holding or waiting for each.
+_LAUNCH_SLOTS = {}
+_LAUNCH_SLOTS_LOCK = threading.Lock()
+
+
+@contextmanager
+def _launch_slot(key, size):
+    """Hold one of the `size` launch slots of a user or lab.
+
+    The semaphore of a key is dropped once no thread holds or waits for it,
+    so that only the users and labs launching are kept, and a new size
+    applies from their next launch.
+    """
+
+    with _LAUNCH_SLOTS_LOCK:
+        entry = _LAUNCH_SLOTS.get(key)
+        if entry is None:
+            entry = _LAUNCH_SLOTS[key] = [threading.BoundedSemaphore(size), 0]
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _LAUNCH_SLOTS_LOCK:
+            entry[1] -= 1
+            if not entry[1]:
+                del _LAUNCH_SLOTS[key]
+
 
 class InstanceManager(OSServerManager):
     """Represents a OpenStack instance manager
@@ -38,7 +78,7 @@ class InstanceManager(OSServerManager):
 
     def __init__(self, session=None, client=None):
         if session:
-            client = NovaClient(version='2', session=session)
+            client = ClientFactory.nova(session)
         if client:
             super().__init__(client)
         else:
@@ -46,6 +86,16 @@ class InstanceManager(OSServerManager):
         self.session = session
         self._client = client
 
+    @request_memoized('instance')
+    def get(self, *args, **kwargs):
+        """Read an instance once per request, see `request_memoized`."""
+        return super().get(*args, **kwargs)
+
+    @request_memoized('instances')
+    def list(self, *args, **kwargs):
+        """Read the list of instances once per request, see `request_memoized`."""
+        return super().list(*args, **kwargs)
+
     @staticmethod
     def count_vms_in_lab(my_vms, lab_id, statuses=('ACTIVE', 'BUILDING', 'SUSPENDED', 'SHUTOFF', 'ERROR', 'REBOOTING')):
         return len([vm for vm in my_vms if vm.status in statuses and vm.tenant_id == lab_id])
@@ -54,7 +104,75 @@ class InstanceManager(OSServerManager):
     def count_other_labs(my_vms, lab_id):
         return len(set([vm.tenant_id for vm in my_vms if vm.tenant_id != lab_id]))
 
-    def list_my_instances(self, show_all=True):
+    def _inventory(self):
+        """ Return the server inventory, brought up to date using this manager
+        :return: the inventory, or None when it is disabled
+        """
+
+        inventory = server_inventory()
+        if inventory is not None:
+            inventory.refresh(self.list)
+        return inventory
+
+    def _servers(self, infos):
+        """ Return server objects bound to this manager for inventory entries """
+
+        return [self.resource_class(self, copy.deepcopy(info), loaded=True)
+                for info in infos]
+
+    def list_all(self):
+        """ Return list of the vm's of all tenants
+        :return: list of all instances
+        """
+
+        inventory = self._inventory()
+        if inventory is None:
+            return self.list(search_opts={'all_tenants': True})
+        return self._servers(inventory.all())
+
+    def list_in_lab(self, lab_id, user_id=None):
+        """ Return list of vm's in a lab, optionally only those of a user
+        :return: list of instances in the lab
+        """
+
+        inventory = self._inventory()
+        if inventory is None:
+            return [vm for vm in self.list(search_opts={'all_tenants': True})
+                    if vm.tenant_id == lab_id and user_id in (None, vm.user_id)]
+        return self._servers(info for info in inventory.for_tenant(lab_id)
+                             if user_id in (None, info['user_id']))
+
+    def list_named(self, prefix):
+        """ Return list of vm's whose name starts with the prefix, e.g. a course or lab name
+        :return: list of instances with the prefix
+        """
+
+        inventory = self._inventory()
+        if inventory is None:
+            return [vm for vm in self.list(search_opts={'all_tenants': True})
+                    if vm.name.startswith(prefix)]
+        return self._servers(inventory.with_prefix(prefix))
+
+    def list_filtered(self, filters, predicate, show_all=True):
+        """ Return list of vm's matching filters, filtered by Nova where the policy allows it
+        Nova silently drops filters it does not allow the caller to use, so the predicate, the
+        same selection made in Python, is always run on the detailed servers listed. It is
+        also used on the unfiltered list when Nova refuses the filters.
+        :param filters: search options, e.g. {'user_id': user_id, 'image': image_id}
+        :param predicate: function telling whether a detailed server matches the filters
+        :param show_all: whether to list the servers of all tenants
+        :return: list of matching instances
+        """
+
+        search_opts = {'all_tenants': show_all}
+        try:
+            servers = self.list(search_opts=dict(search_opts, **filters))
+        except (nova_exceptions.Forbidden, nova_exceptions.BadRequest):
+            LOG.info('Nova refused server filters, filtering in Resela.')
+            servers = self.list(search_opts=search_opts)
+        return [vm for vm in servers if predicate(vm)]
+
+    def list_my_instances(self, show_all=True, user_id=None):
         """ Return list of vm's current user own
         This function is required as a normal user do not have filter permissions in openstack.
         Listing with search opts is limited to admin api, however in resela students and teachers
@@ -63,12 +181,9 @@ class InstanceManager(OSServerManager):
         :return: list of instances owned by current user
         """
 
-        return [
-            vm for vm in self._client.servers.list(search_opts={'all_tenants': show_all})
-            if current_user.user_id in vm.user_id
-        ]
+        return self.list_instances_for_user_id(user_id or current_user.user_id, show_all)
 
-    def list_my_instances_for_image(self, image_id, show_all=True):
+    def list_my_instances_for_image(self, image_id, show_all=True, user_id=None):
         """ Return list of vm's current user own
         This function is required as a normal user do not have filter permissions in openstack.
         Listing with search opts is limited to admin api, however in resela students and teachers
@@ -77,21 +192,52 @@ class InstanceManager(OSServerManager):
         :return: list of instances owned by current user
         """
 
-        return [
-            vm for vm in self._client.servers.list(search_opts={'all_tenants': show_all})
-            if current_user.user_id in vm.user_id and vm.image['id'] == image_id
-        ]
+        user_id = user_id or current_user.user_id
+        inventory = self._inventory() if show_all else None
+        if inventory is not None:
+            return self._servers(info for info in inventory.for_image(image_id)
+                                 if info['user_id'] == user_id)
+        return self.list_filtered(
+            {'user_id': user_id, 'image': image_id},
+            lambda vm: vm.user_id == user_id and (vm.image or {}).get('id') == image_id,
+            show_all=show_all)
+
+    def count_my_instances_for_image(self, image_id, show_all=True, user_id=None):
+        """ Return number of vm's current user own for image
+        :return: number of instances owned by current user
+        """
+
+        user_id = user_id or current_user.user_id
+        inventory = self._inventory() if show_all else None
+        if inventory is not None:
+            return len([info for info in inventory.for_image(image_id)
+                        if info['user_id'] == user_id])
+        return len(self.list_filtered(
+            {'user_id': user_id, 'image': image_id},
+            lambda vm: vm.user_id == user_id and (vm.image or {}).get('id') == image_id,
+            show_all=show_all))
 
     def list_instances_for(self, user, show_all=True):
         """ Return list of vm's user own
         :return: list of instances owned by current user
         """
-        return [
-            vm for vm in self._client.servers.list(search_opts={'all_tenants': show_all})
-            if user.id in vm.user_id
-        ]
 
-    def create_instance(self, lab, instance_name, image, flavor, user_session, user_m):
+        return self.list_instances_for_user_id(user.id, show_all)
+
+    def list_instances_for_user_id(self, user_id, show_all=True):
+        """ Return list of vm's the user with the id own
+        Read from the server inventory when listing all tenants.
+        :return: list of instances owned by the user
+        """
+
+        inventory = self._inventory() if show_all else None
+        if inventory is not None:
+            return self._servers(inventory.for_user(user_id))
+        return self.list_filtered({'user_id': user_id}, lambda vm: vm.user_id == user_id,
+                                  show_all=show_all)
+
+    def create_instance(self, lab, instance_name, image, flavor, user_session, user_m,
+                        user_id=None):
         """Create an instance in the OpenStack
 
         :param lab: The lab that the instance should be started in
@@ -106,21 +252,124 @@ class InstanceManager(OSServerManager):
         :type user_session: Keystone Session
         :param user_m: UserManager that manages the users
         :type user_m: UserManager
+        :param user_id: Id of the user creating the instance, the current user by default
+        :type user_id: str
         :raise InstanceManagerAnotherActiveLab: When another lab is already active
         :raise InstanceManagerTooManyInstancesInLab: When too many instances are active already
         :raise InstanceManagerTooManyLabs: When too many labs are already active
         :raise InstanceManagerUnknownFault: When the InstanceManager reaches an unknown error
         :return: Returns the instance object created
         """
-        my_vms = self.list_my_instances()
-        user = user_m.get(current_user.user_id)
+        user_id = user_id or current_user.user_id
+        with _launch_slot('user:' + user_id, 1):
+            network_id, _ = self._prepare_launch(lab, user_session, user_m, user_id)
+            return self._boot(lab, instance_name, image, flavor, network_id)
+
+    def create_instances(self, lab, instances, user_session, user_m, user_id=None,
+                         on_step=None):
+        """Create several instances of a lab at once
+
+        The checks and the network of the user are done once, then the
+        instances are booted concurrently and waited for as a group. At most
+        `launch_per_user` instances of a user and `launch_per_lab` instances
+        of a lab are booted at the same time. The launches of a user are made
+        one after another, each checking the limits against the instances
+        the previous ones created.
+
+        :param lab: The lab that the instances should be started in
+        :type lab: lab object
+        :param instances: The step name, instance name, image and flavor of \
+            each instance
+        :type instances: list of tuple
+        :param user_session: Session of the project
+        :type user_session: Keystone Session
+        :param user_m: UserManager that manages the users
+        :type user_m: UserManager
+        :param user_id: Id of the user creating the instances, the current user by default
+        :type user_id: str
+        :param on_step: Called with the step name and `QUEUED`, `BUILD`, \
+            `ACTIVE` or `ERROR` as each instance progresses
+        :type on_step: function
+        :raise InstanceManagerAnotherActiveLab: When another lab is already active
+        :raise InstanceManagerTooManyInstancesInLab: When too many instances \
+            are active, once the allowed ones were created
+        :raise InstanceManagerTooManyLabs: When too many labs are already active
+        :return: Returns the instance objects created
+        """
+        user_id = user_id or current_user.user_id
+        instances = list(instances)
+        if not instances:
+            return []
+
+        config = APP.iniconfig['resela']
+        per_user = max(config.getint('launch_per_user'), 1)
+        per_lab = max(config.getint('launch_per_lab'), 1)
+
+        with _launch_slot('user:' + user_id, 1):
+            return self._create_instances(lab, instances, user_session, user_m, user_id,
+                                          on_step, per_user, per_lab)
+
+    def _create_instances(self, lab, instances, user_session, user_m, user_id, on_step,
+                          per_user, per_lab):
+        network_id, room = self._prepare_launch(lab, user_session, user_m, user_id)
+
+        def boot(step, instance_name, image, flavor):
+            with _launch_slot('lab:' + lab.id, per_lab):
+                if on_step is not None:
+                    on_step(step, 'BUILD')
+                try:
+                    instance = self._boot(lab, instance_name, image, flavor, network_id)
+                except Exception:
+                    if on_step is not None:
+                        on_step(step, 'ERROR')
+                    raise
+                if on_step is not None:
+                    on_step(step, 'ACTIVE')
+                return instance
+
+        allowed = instances[:room]
+        if on_step is not None:
+            for instance in allowed:
+                on_step(instance[0], 'QUEUED')
+        with ThreadPoolExecutor(max_workers=min(len(allowed), per_user),
+                                thread_name_prefix='resela-launch') as executor:
+            futures = [executor.submit(boot, *instance) for instance in allowed]
+            wait(futures)
+
+        created = []
+        failure = None
+        for future in futures:
+            try:
+                created.append(future.result())
+            except InstanceManagerUnknownFault as error:
+                LOG.exception(error)
+            except Exception as error:
+                failure = failure or error
+        if failure is not None:
+            raise failure
+
+        if len(instances) > room:
+            raise InstanceManagerTooManyActiveInstancesInLab('Instances in lab limit reached')
+        return created
 
-        make_new_network = False
+    def check_launch(self, lab, user_id=None):
+        """ Check that a user may launch instances in a lab
+
+        :param lab: The lab that the instances should be started in
+        :type lab: lab object
+        :param user_id: Id of the user, the current user by default
+        :type user_id: str
+        :raise InstanceManagerAnotherActiveLab: When another lab is already active
+        :raise InstanceManagerTooManyInstancesInLab: When too many instances are active already
+        :raise InstanceManagerTooManyLabs: When too many labs are already active
+        :return: The instances of the user
+        """
+        my_vms = self.list_my_instances(user_id=user_id or current_user.user_id)
 
         number_of_active_instances = self.count_vms_in_lab(my_vms=my_vms, lab_id=lab.id,
                                                            statuses=('ACTIVE', 'BUILDING'))
-        number_of_total_instances = self.count_vms_in_lab(my_vms=my_vms, lab_id=lab.id)
         number_of_other_labs = self.count_other_labs(my_vms=my_vms, lab_id=lab.id)
+        instance_limit = APP.iniconfig.getint('resela', 'instance_limit')
 
         # Check if another lab is active
         if any(vm for vm in my_vms if vm.status == 'ACTIVE' and vm.tenant_id != lab.id):
@@ -128,20 +377,37 @@ class InstanceManager(OSServerManager):
             raise InstanceManagerAnotherActiveLab('Another lab is active')
 
         # Check number of active VMs in this lab
-
-        if number_of_active_instances >= APP.iniconfig.getint('resela', 'instance_limit'):
+        if number_of_active_instances >= instance_limit:
             raise InstanceManagerTooManyActiveInstancesInLab('Instances in lab limit reached')
 
-        elif number_of_total_instances is 0:
-            make_new_network = True
-
-            # Check whether the maximum number of labs have been reached (active or inactive)
-        if number_of_other_labs >= APP.iniconfig.getint('resela', 'instance_limit'):
+        # Check whether the maximum number of labs have been reached (active or inactive)
+        if number_of_other_labs >= instance_limit:
             raise InstanceManagerTooManyLabs('Too many labs started')
 
         # TODO(Kaese): If booking is implemented, it should be here !
 
-        instance = None
+        return my_vms
+
+    def _prepare_launch(self, lab, user_session, user_m, user_id):
+        """Check that a user may launch instances in a lab, and create the
+        network of the user in the lab if it has none yet.
+
+        :return: The id of the network and the number of instances the user \
+            may still start in the lab.
+        :rtype: tuple
+        """
+        # Up to date with the instances created by the previous launches.
+        inventory = server_inventory()
+        if inventory is not None:
+            inventory.refresh(self.list, force=True)
+        my_vms = self.check_launch(lab, user_id)
+        user = user_m.get(user_id)
+
+        number_of_active_instances = self.count_vms_in_lab(my_vms=my_vms, lab_id=lab.id,
+                                                           statuses=('ACTIVE', 'BUILDING'))
+        number_of_total_instances = self.count_vms_in_lab(my_vms=my_vms, lab_id=lab.id)
+        instance_limit = APP.iniconfig.getint('resela', 'instance_limit')
+        make_new_network = number_of_total_instances == 0
 
         if make_new_network:
             user_model = UserModel.query.get(user.id)
@@ -176,52 +442,77 @@ class InstanceManager(OSServerManager):
             user_m.update(user=user, network_id=network['id'], vlan=vlan)
 
         user = user_m.get(user.id)
-        network_id = user.network_id
+        return user.network_id, instance_limit - number_of_active_instances
+
+    def _boot(self, lab, instance_name, image, flavor, network_id):
+        """Boot an instance on the network of the user and wait until it is active."""
         nics = [{'net-id': network_id}]
-        has_internet = lab.internet
+        security_group = 'internet' if lab.internet else 'no-internet'
+        if self.session is not None:
+            security_group = SecurityGroupHandler(self.session).group_id(lab.id, security_group)
+
+        # Boot straight into the security group of the lab, rather than the default one
         instance = self.create(name=instance_name,
                                image=image,
                                flavor=flavor,
                                nics=nics,
+                               security_groups=[security_group],
                                meta={'image_name': image.name.split('|')[2]})
 
         self.wait_for_status(instance.id, 'ACTIVE')
 
-        # Set security groups
-        if has_internet:
-            self.add_security_group(instance.id, 'internet')
-        else:
-            self.add_security_group(instance.id, 'no-internet')
-        self.remove_security_group(instance.id, 'default')
-
         return instance
 
-    def wait_for_status(self, instance_id, expected_status):
+    def wait_for_status(self, instance_id, expected_status, timeout=-1):
         """ Wait for a specific status for an instance
 
+        The instance is polled by the status watcher, along with every other instance waited
+        for in the project.
+
         :param instance_id: The id of the instance that is being observed
         :type instance_id: str
         :param expected_status: The status expected on a specific instance
         :type expected_status: str
+        :param timeout: Seconds to wait, status_timeout by default
+        :type timeout: float
         :raises InstanceManagerUnknownFault: When the instance fails return the expected result
         :return: returns status after timeout or success
         """
-        timeout = 0
-        status = 'ERROR'
-        while timeout < 360:
-            try:
-                status = self.get(instance_id).status
-            except Exception:  # Ugly fix since we dont know what 404 exception is thrown
-                status = 'DELETED'
-            if status == expected_status:
-                break
-            elif status == 'ERROR':
-                raise InstanceManagerUnknownFault('Instance returned ERROR')
-            time.sleep(1)
-            timeout += 1
-
+        status = self.watch_status(instance_id, expected_status, timeout).result()
+        if status == 'ERROR' and expected_status != 'ERROR':
+            raise InstanceManagerUnknownFault('Instance returned ERROR')
         return status
 
+    def watch_status(self, instance_id, expected_status, timeout=-1):
+        """ Watch an instance until it reaches a specific status, without blocking
+        A deleted instance has the DELETED status.
+        :return: Future completed with the status, once expected, ERROR or timed out
+        :rtype: concurrent.futures.Future
+        """
+        return status_watcher().watch(('server', self._project()), self._statuses, instance_id,
+                                      expected_status, stop=('ERROR',), gone='DELETED',
+                                      timeout=timeout)
+
+    def _project(self):
+        """The project listed by this manager, the manager itself without a session."""
+        return self.session.get_project_id() if self.session is not None else id(self)
+
+    def _statuses(self, instance_ids):
+        """ Return the status of the instances, read with one listing
+        Instances not listed, e.g. of another project, are read one by one.
+        :return: statuses keyed by id, without the instances not found
+        """
+
+        wanted = set(instance_ids)
+        statuses = {server.id: server.status for server in self.list(fresh=True)
+                    if server.id in wanted}
+        for instance_id in wanted - set(statuses):
+            try:
+                statuses[instance_id] = self.get(instance_id, fresh=True).status
+            except nova_exceptions.NotFound:
+                pass
+        return statuses
+
     def change_instance_state(self, user_m, lab_id, instance_id, expected_status):
         """ Change state of instance
 
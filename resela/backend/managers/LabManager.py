@@ -9,10 +9,14 @@ from time import sleep
 import flask
 from flask_login import current_user
 from keystoneauth1 import exceptions as ksa_exceptions
-from keystoneclient.v3.client import Client as KeystoneClient
+from keystoneclient import base
 from keystoneclient.v3.projects import ProjectManager
 from flask import current_app
 
+from resela.backend.classes.ClientFactory import ClientFactory
+from resela.backend.classes.ImageUsageIndex import image_usage_index
+from resela.backend.classes.KeystoneCatalog import cached_find, cached_get
+from resela.backend.classes.RequestCache import request_memoized
 from resela.backend.classes.SecurityGroupHandler import SecurityGroupHandler
 from resela.backend.managers.CourseManager import CourseManager
 from resela.backend.managers.FlavorManager import FlavorManager
@@ -33,7 +37,7 @@ class LabManager(ProjectManager):
     """
     def __init__(self, session=None, client=None):
         if session:
-            client = KeystoneClient(session=session)
+            client = ClientFactory.keystone(session)
         if client:
             super().__init__(client)
         else:
@@ -41,15 +45,61 @@ class LabManager(ProjectManager):
 
         self._client = client
 
-    def launch_lab(self, lab_id):
+    @request_memoized('lab')
+    def get(self, project, **kwargs):
+        """Read a lab once per request, through the Keystone catalog, see `request_memoized`."""
+        if kwargs:
+            return super().get(project, **kwargs)
+        return cached_get(self, 'project', project, super().get)
+
+    def find(self, **kwargs):
+        """Find a lab, by name through the Keystone catalog."""
+        if list(kwargs) != ['name']:
+            return super().find(**kwargs)
+        return cached_find(self, 'project', kwargs['name'], super().find)
+
+    def create(self, *args, **kwargs):
+        """Create a lab, indexing the images it uses."""
+        lab = super().create(*args, **kwargs)
+        image_usage_index().put(lab.to_dict())
+        return lab
+
+    def update(self, project, *args, **kwargs):
+        """Update a lab, e.g. its `img_list` or `base_img`, reindexing the images it uses."""
+        lab = super().update(project, *args, **kwargs)
+        image_usage_index().put(lab.to_dict())
+        return lab
+
+    def delete(self, project):
+        """Delete a lab, removing it from the image usage index."""
+        result = super().delete(project)
+        image_usage_index().discard(base.getid(project))
+        return result
+
+    def image_users(self, image_id, fresh=False):
+        """ Return the labs and snapshot factories using an image
+        Read from the image usage index, listing the projects only when it expired or when
+        fresh, e.g. before deleting the image, as labs may have been created by other workers.
+        Keystone cannot list the projects using one image, so a fresh answer always costs a
+        listing of every project, which rebuilds the whole index as it goes.
+        :return: id and name of each project using the image
+        """
+        index = image_usage_index()
+        index.refresh(self.list, force=fresh)
+        return index.users_of(image_id)
+
+    def launch_lab(self, lab_id, user=None, job=None):
         """ Initializes the lab for a user
 
-        :param auth_manager: Authentication manager object
-        :type auth_manager: AuthenticationManager.AuthenticationManager
+        May run outside of a request, e.g. as a job of the job queue, given
+        the user explicitly.
+
         :param lab_id: Id of the lab which should be launched
         :type lab_id: str
-        :param user_id: Id of the user which tries to launch the lab
-        :type user_id: str
+        :param user: The user launching the lab, the current user by default
+        :type user: resela.model.User.User
+        :param job: Job reporting the progress of each instance, if any
+        :type job: resela.backend.classes.JobQueue.Job
         :raise LabManagerLaunchFail: When the lab fails to launch because of \
             too many instances in lab or an active lab
         :return:
@@ -57,53 +107,61 @@ class LabManager(ProjectManager):
 
         from resela.model.User import authenticate
 
-        image_manager = ImageManager(session=current_user.session)
-        flavor_manager = FlavorManager(session=current_user.session)
+        user = user or current_user
+        image_manager = ImageManager(session=user.session)
+        flavor_manager = FlavorManager(session=user.session)
         user_manager = self._client.users
 
         lab = self.get(lab_id)  # TODO(Kaese): Check returned value ?
         lab_images = lab.img_list
-        instance_name_base = lab.name + '|' + current_user.email
+        instance_name_base = lab.name + '|' + user.email
 
         # Required since instances are launched in the project to which
         # the session belongs
         project_session = authenticate(
-            credentials=current_user.token,
+            credentials=user.token,
             project_domain_name=lab.name.split('|')[0],
             project_name=lab.name
         )
 
         local_instance_manager = InstanceManager(session=project_session)
+        images = image_manager.get_many(descriptor[0] for descriptor in lab_images)
+        flavors = flavor_manager.by_name()
+
+        # Gather every instance not started yet, to boot them all at once
+        instances = []
         for image_descriptor in lab_images:
-            try:
-                image_id = image_descriptor[0]
-                image_amount = image_descriptor[1]
-                image_object = image_manager.get(image_id)
-                flavor_object = flavor_manager.find(name=image_object.flavor_name)
-
-                total_active_instances = \
-                    len(local_instance_manager.list_my_instances_for_image(
-                        show_all=False, image_id=image_id))
-
-                # Create each remaining not started instances
-                for i in range(int(image_amount) - total_active_instances):
-                    local_instance_manager.create_instance(
-                        lab=lab,
-                        instance_name=instance_name_base,
-                        image=image_object,
-                        flavor=flavor_object,
-                        user_session=current_user.session,
-                        user_m=user_manager
-                    )
-
-            except InstanceManagerUnknownFault as error:
-                # TODO(jiah): These really need to be handled
-                # raise LabManagerLaunchFail(e)
-                LOG.exception(error)
-                pass
-            except InstanceManagerInstanceActive:
-                # Basically means the instance is already active
-                pass
+            image_id = image_descriptor[0]
+            image_amount = image_descriptor[1]
+            image_object = images[image_id]
+            flavor_object = flavors.get(image_object.flavor_name) or \
+                flavor_manager.find(name=image_object.flavor_name)
+
+            total_active_instances = \
+                local_instance_manager.count_my_instances_for_image(
+                    show_all=False, image_id=image_id, user_id=user.user_id)
+
+            # Create each remaining not started instances
+            for i in range(int(image_amount) - total_active_instances):
+                step = '{} #{}'.format(image_object.name.split('|')[-1], i + 1)
+                instances.append((step, instance_name_base, image_object, flavor_object))
+
+        try:
+            local_instance_manager.create_instances(
+                lab=lab,
+                instances=instances,
+                user_session=user.session,
+                user_m=user_manager,
+                user_id=user.user_id,
+                on_step=job.step if job is not None else None
+            )
+        except InstanceManagerUnknownFault as error:
+            # TODO(jiah): These really need to be handled
+            # raise LabManagerLaunchFail(e)
+            LOG.exception(error)
+        except InstanceManagerInstanceActive:
+            # Basically means the instance is already active
+            pass
 
     def create_lab(self, course_id, lab_title, lab_internet, lab_description):
         """Create a lab to a course. Granting the course group permissions to the lab.
@@ -241,9 +299,10 @@ class LabManager(ProjectManager):
             for i in sec_group['security_groups']:
                 if i['tenant_id'] == lab_id and 'internet' in i['name']:
                     sec_handler.delete(i['id'])
+        SecurityGroupHandler.forget_group_ids(lab_id)
 
         sleep(4)
-        self._client.projects.delete(project=lab_id)
+        self.delete(lab_id)
         return True
 
     def create_snapshot_factory_project(self, user):
@@ -8,6 +8,7 @@ from contextlib import contextmanager
 import paramiko
 
 from resela.app import APP
+from resela.backend.classes.CallTracer import traced
 from resela.backend.classes.NetworkHandler import NetworkHandler
 from resela.backend.managers.ManagerException import UserManagerCreationFail
 
@@ -34,14 +35,25 @@ class MikrotikManager:
         ssh_client = paramiko.SSHClient()
         # Auto accepts the fingerprint verification.
         ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh_client.connect(
-            hostname=self.hostname,
-            username=self.username,
-            password=self.password,
-            port=self.port,
-            allow_agent=False,
-            look_for_keys=False
-        )
+        with traced('SSH %s:%s connect' % (self.hostname, self.port)):
+            ssh_client.connect(
+                hostname=self.hostname,
+                username=self.username,
+                password=self.password,
+                port=self.port,
+                allow_agent=False,
+                look_for_keys=False
+            )
+
+        exec_command = ssh_client.exec_command
+
+        def traced_exec_command(command, *args, **kwargs):
+            # Only the command path is named, as arguments may hold passwords.
+            with traced('SSH %s:%s %s' % (self.hostname, self.port,
+                                          ' '.join(command.split()[:2]))):
+                return exec_command(command, *args, **kwargs)
+
+        ssh_client.exec_command = traced_exec_command
         try:
             yield ssh_client
         finally:
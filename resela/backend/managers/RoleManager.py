@@ -5,11 +5,12 @@ RoleManager.py
 
 from functools import wraps
 
-from keystoneclient.v3.client import Client as KeystoneClient
 from keystoneclient.v3.roles import RoleManager as OSRoleManager
 from flask import jsonify, abort
 from flask_login import current_user
 
+from resela.backend.classes.ClientFactory import ClientFactory
+from resela.backend.classes.KeystoneCatalog import cached_find, cached_get
 from resela.backend.managers.ManagerException import RoleManagerCreationFail
 
 """ Defined roles in resela """
@@ -20,7 +21,7 @@ class RoleManager(OSRoleManager):
     """Represents a openstack role manager"""
     def __init__(self, session=None, client=None):
         if session:
-            client = KeystoneClient(session=session)
+            client = ClientFactory.keystone(session)
         if client:
             super().__init__(client)
         else:
@@ -28,6 +29,16 @@ class RoleManager(OSRoleManager):
 
         self._client = client
 
+    def get(self, role):
+        """Read a role through the Keystone catalog."""
+        return cached_get(self, 'role', role, super().get)
+
+    def find(self, **kwargs):
+        """Find a role, by name through the Keystone catalog."""
+        if list(kwargs) != ['name']:
+            return super().find(**kwargs)
+        return cached_find(self, 'role', kwargs['name'], super().find)
+
     def retrieve_most_privileged_role(self, **kwargs):
         """
         Retrieve the most privileged role of a user based on the groups he or
@@ -5,13 +5,15 @@ UserManager.py
 
 import flask
 from flask_mail import Mail, Message
-from keystoneclient.v3.client import Client as KeystoneClient
+from keystoneclient import base
 from keystoneclient.v3.users import UserManager as OSUserManager
 
 from resela.app import APP
+from resela.backend.classes.ClientFactory import ClientFactory
+from resela.backend.classes.RequestCache import request_memoized
 from resela.backend.classes.NetworkHandler import NetworkHandler
 from resela.backend.classes.SecurityGroupHandler import SecurityGroupHandler
-from resela.backend.managers.CourseManager import CourseManager
+from resela.backend.managers.CourseManager import CourseManager, forget_memberships
 from resela.backend.managers.GroupManager import GroupManager
 from resela.backend.managers.InstanceManager import InstanceManager
 from resela.backend.managers.LabManager import LabManager
@@ -32,7 +34,7 @@ class UserManager(OSUserManager):
     """Represents a openstack user manager"""
     def __init__(self, session=None, client=None):
         if session:
-            client = KeystoneClient(session=session)
+            client = ClientFactory.keystone(session)
         if client:
             super().__init__(client)
         else:
@@ -40,6 +42,23 @@ class UserManager(OSUserManager):
 
         self._client = client
 
+    @request_memoized('user')
+    def get(self, *args, **kwargs):
+        """Read a user once per request, see `request_memoized`."""
+        return super().get(*args, **kwargs)
+
+    def add_to_group(self, user, group):
+        """Add a user to a group, forgetting his or her course memberships."""
+        result = super().add_to_group(user, group)
+        forget_memberships(base.getid(user))
+        return result
+
+    def remove_from_group(self, user, group):
+        """Remove a user from a group, forgetting his or her course memberships."""
+        result = super().remove_from_group(user, group)
+        forget_memberships(base.getid(user))
+        return result
+
     def add_user(self, user_email, first_name, last_name, password, role):
         """
         Creates a password for the user and adds the user to openstack.
@@ -168,6 +187,7 @@ class UserManager(OSUserManager):
 
             # Remove user from openstack
             removed = self.delete(user)
+            forget_memberships(user.id)
 
             if not removed:
                 print('User was not deleted:', user.id)
@@ -14,8 +14,10 @@ from functools import partial
 from flask_login import current_user, login_user, logout_user, login_required
 from itsdangerous import URLSafeTimedSerializer, BadSignature
 from keystoneauth1 import exceptions as ksa_exceptions
-from resela.model.User import User, authenticate as user_authenticate
+from resela.model.User import User, authenticate as user_authenticate, \
+    cache_login, forget_token
 from resela.app import APP
+from resela.backend.classes.SessionStore import regenerate
 from resela.model.RecaptchaModel import RecaptchaModel
 from resela.model.UtilityModel import is_safe_url
 from resela.backend.managers.UserManager import UserManager
@@ -92,9 +94,10 @@ def login():
                 'role': session.auth.auth_ref['roles'][0]['name'],
             }
 
-            session_user = User(**session_user_kwargs)
+            session_user = User(session=session, **session_user_kwargs)
+            regenerate(flask.session)
             login_user(session_user)
-            flask.session['session'] = json.dumps(session.get_auth_headers())
+            flask.session['session'] = json.dumps(cache_login(session, session_user))
 
             # Abort if the `next` argument does not lead to a "safe" page.
             if not is_safe_url(next):
@@ -123,6 +126,9 @@ def logout():
     session file and forward to the index page.
     """
 
+    if 'session' in flask.session:
+        forget_token(json.loads(flask.session['session'])['X-Auth-Token'])
+
     flask.session.clear()
     logout_user()
     return flask.redirect(flask.url_for('default.index'))
@@ -95,8 +95,9 @@ def image_library():
     version = Version.query.all()
     os = OS.query.all()
     if current_user.role == 'teacher':
+        my_courses = course_m.memberships(current_user.user_id)
         courses = [course for course in course_m.list_courses()
-                   if course_m.check_in_course(current_user.user_id, course.id)]
+                   if course.id in my_courses]
 
         course_w_labs = {}
         for course in courses:
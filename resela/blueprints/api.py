@@ -10,7 +10,6 @@ note: api calls only responds with jsonify, never render_template
 import datetime
 import logging
 import tempfile
-import time
 from functools import partial
 from random import choice
 from string import ascii_lowercase, ascii_uppercase, digits
@@ -19,12 +18,16 @@ import flask
 from flask_login import current_user
 from keystoneauth1 import exceptions as ksa_exceptions
 from glanceclient.exc import HTTPException
+from novaclient import exceptions as nova_exceptions
 from werkzeug.utils import secure_filename
 
 from resela.app import DATABASE, APP, after_this_request
 from resela.backend.SqlOrm.OsModel import OS
 from resela.backend.SqlOrm.VersionModel import Version
 from resela.backend.classes.FileHandler import FileHandler
+from resela.backend.classes.ImageSearchIndex import image_search_index
+from resela.backend.classes.JobQueue import job_queue
+from resela.backend.classes.ServerInventory import server_inventory
 from resela.backend.managers.CourseManager import CourseManager
 from resela.backend.managers.FlavorManager import FlavorManager
 from resela.backend.managers.GroupManager import GroupManager
@@ -460,8 +463,15 @@ def lab_launch():
         if not course_m.check_in_course(current_user.user_id, lab.domain_id):
             raise NotInCourse('User not in course.')
 
-        lab_m.launch_lab(lab_id=lab_id)
-        return flask.jsonify(success=True)
+        # Checked here as well, for the user to get the feedback at once.
+        InstanceManager(session=current_user.session).check_launch(lab, current_user.user_id)
+
+        user = current_user._get_current_object()
+        job = job_queue().submit(user.user_id, 'launch_lab', lab_m.launch_lab,
+                                 key='launch_lab:{}:{}'.format(user.user_id, lab_id),
+                                 lab_id=lab_id, user=user)
+        return flask.jsonify(success=True, job_id=job.id,
+                             job_url=flask.url_for('api.job_status', job_id=job.id))
 
     except (InstanceManagerTooManyActiveInstancesInLab,
             InstanceManagerTooManyLabs,
@@ -474,6 +484,22 @@ def lab_launch():
         )
 
 
+@api.route('/jobs/<string:job_id>')
+@requires_roles('admin', 'teacher', 'student')
+@error_handling
+def job_status(job_id):
+    """Report the progress of a job started by the user, e.g. a lab launch.
+
+    Flask input:
+        * **job_id**: Id of the job.
+    """
+
+    job = job_queue().status(job_id, owner=current_user.user_id)
+    if job is None:
+        return flask.jsonify(success=False, feedback='No such job.')
+    return flask.jsonify(success=True, job=job)
+
+
 @api.route('/lab/remove_image', methods=['POST'])
 @requires_roles('admin', 'teacher')
 @error_handling
@@ -837,7 +863,8 @@ def image_upload():
     if image_size > APP.iniconfig.getfloat('resela', 'upload_limit'):
         raise ExceedsUploadLimit('The image size exceeds the upload limit.')
 
-    if any(image.checksum == image_hash for image in image_m.list()):
+    # Asked to Glance, as an index may still hold an image deleted since.
+    if image_m.with_checksum(image_hash):
         raise MD5Match('The file is already present in the library.')
 
     if image_type == 'Default' and current_user.role != 'admin':
@@ -960,19 +987,9 @@ def library_remove_image():
 
     lab_m = LabManager(session=current_user.session)
     image_m = ImageManager(session=current_user.session)
-    image_is_used = False
-
-    for lab in lab_m.list():
-        if '|' in lab.name:
-            if lab.name.split('|')[0] not in ('imageLibrary', 'snapshotFactory'):
-                for tmp_image in lab.img_list:
-                    image_is_used = (image_id == tmp_image[0])
-                    if image_is_used:
-                        break
-            elif 'snapshotFactory' in lab.name:
-                image_is_used = (lab.base_img == image_id)
-
-    if image_is_used:
+
+    # Not answered from the index: a lab created by another worker may not be in it yet.
+    if lab_m.image_users(image_id, fresh=True):
         raise ImageIsUsed('Image is used.')
 
     image = image_m.get(image_id=image_id)
@@ -996,6 +1013,24 @@ def library_remove_image():
     return flask.jsonify(result=True)
 
 
+@api.route('/library/image_usage/<string:image_id>')
+@requires_roles('admin', 'teacher')
+@error_handling
+def library_image_usage(image_id):
+    """List the labs and snapshot factories using a specified image.
+
+    Flask input:
+        * **image_id**: The id of the image.
+    """
+
+    lab_m = LabManager(session=current_user.session)
+    return flask.jsonify({
+        'success': True,
+        'labs': [{'id': lab_id, 'name': lab_name}
+                 for lab_id, lab_name in lab_m.image_users(image_id)]
+    })
+
+
 @api.route('/database/add_user', methods=['POST'])
 @error_handling
 def database_add_user():
@@ -1100,21 +1135,19 @@ def search_for_images():
     search_flavor = flask.request.form['flavor']
     search_library = flask.request.form['library']
     selected_os = DATABASE.session.query(OS).filter(OS.id == search_os).first()
-    lowercase_keyword = search_keyword.lower()
-    all_images = image_m.list()
-    matched_images = []
-    for image in all_images:
-        if (lowercase_keyword == '' or any(
-                    keyword in image.keywords.split(',') for keyword in
-                    lowercase_keyword.split(','))) \
-                and (search_internet == '' or search_internet == image.internet) \
-                and (search_os == '' or selected_os.name == image.os) \
-                and (search_version == '' or search_version == image.version) \
-                and (search_flavor == '' or search_flavor == image.flavor_name) \
-                and (search_library == '' or search_library.lower() ==
-                    image.name.split('|')[1]):
-            matched_images.append(image.id)
-    return flask.jsonify({'success': True, 'images': matched_images})
+
+    index = image_search_index(current_user.role)
+    index.refresh(image_m.list)
+    search = dict(
+        keywords=search_keyword.split(','),
+        internet=search_internet,
+        os=selected_os.name if search_os else '',
+        version=search_version,
+        flavor=search_flavor,
+        library=search_library.lower()
+    )
+    return flask.jsonify({'success': True, 'images': index.search(**search),
+                          'facets': index.facet_counts(**search)})
 
 
 @api.route('/library/download_image/<string:image_id>')
@@ -1376,16 +1409,15 @@ def snapshot_factory_create_snapshot():
 
     image_m = ImageManager(current_user.session)
 
-    # Loop that waits for the image to be created from the instance.
+    # Wait for the image to be created from the instance.
     # Needs to be completely built before proceeding
-    building = True
-    snapshot = None
-    while building:
-        snapshot = image_m.get(image)
-        if snapshot.status == 'active':
-            building = False
-        else:
-            time.sleep(1)
+    status = image_m.wait_for_status(
+        image, 'active', timeout=APP.iniconfig.getint('resela', 'snapshot_timeout'))
+    if status != 'active':
+        msg = 'The snapshot could not be built.'
+        LOG.error('%s Image %s is %s.', msg, image, status)
+        return flask.jsonify(success=False, feedback=msg)
+    snapshot = image_m.get(image, fresh=True)
 
     try:
         # Update the image owner from snapshot factory to image library snapshot project
@@ -1506,23 +1538,47 @@ def snapshot_factory_shutdown_instance():
     )
 
 
+def _resolve_instance(instance_id, lab_id=None):
+    """
+    Look up an instance directly, first with the session of the user, then
+    with a session scoped to the lab the instance is in. The lab is given by
+    the caller or found in the server inventory.
+
+    :raise NoInstanceFound: The instance does not exist or is not visible.
+    """
+
+    try:
+        return InstanceManager(session=current_user.session).get(instance_id)
+    except (nova_exceptions.NotFound, nova_exceptions.Forbidden):
+        pass
+
+    if not lab_id:
+        inventory = server_inventory()
+        info = inventory.get(instance_id) if inventory is not None else None
+        lab_id = info['tenant_id'] if info is not None else None
+    if not lab_id:
+        raise NoInstanceFound('No instance was found')
+
+    lab = LabManager(current_user.session).get(lab_id)
+    lab_session = authenticate(
+        credentials=current_user.token,
+        project_domain_name=lab.name.split('|')[0],
+        project_name=lab.name
+    )
+    try:
+        return InstanceManager(session=lab_session).get(instance_id)
+    except (nova_exceptions.NotFound, nova_exceptions.Forbidden):
+        raise NoInstanceFound('No instance was found')
+
+
 @api.route('/instance/show/<string:instance_id>')
 @requires_roles('admin', 'teacher', 'student')
 @error_handling
 def instance_box(instance_id):
 
-    instance_m = InstanceManager(session=current_user.session)
     image_m = ImageManager(session=current_user.session)
 
-    instance = None
-    # This is shit, but has to be
-    for i in instance_m.list(search_opts={'all_tenants': True}):
-        if i.id == instance_id:
-            instance = i
-            break
-
-    if not instance:
-        NoInstanceFound('No instance was found')
+    instance = _resolve_instance(instance_id, flask.request.args.get('lab_id'))
 
     if 'snapshotFactory' not in instance.name:
         instance.owner = instance.name.split('|')[2]
@@ -1534,19 +1590,11 @@ def instance_box(instance_id):
     if instance.networks:
         instance.ip = instance.networks.popitem()[1][0]
 
-    image = image_m.get(image_id=instance.image['id'])
-
-    if hasattr(image, 'username'):
-        username = image.username
-    else:
-        username = ''
-        LOG.warning('Image %s has no username.' % image.id)
-
-    if hasattr(image, 'password'):
-        password = image.password
-    else:
-        password = ''
-        LOG.warning('Image %s has no password.' % image.id)
+    username, password = image_m.credentials(instance.image['id'])
+    if not username:
+        LOG.warning('Image %s has no username.' % instance.image['id'])
+    if not password:
+        LOG.warning('Image %s has no password.' % instance.image['id'])
 
     return flask.render_template(
         'instance_box.html',
@@ -143,17 +143,18 @@ def lab(lab_id):
 
         image_m = ImageManager(session=current_user.session)
 
-        # TODO(aber): Only take instances in the lab and not all started by the user
         if current_user.role == 'admin':
-            instances = instance_m.list(search_opts={'all_tenants': True})
+            lab_object.instances = instance_m.list_in_lab(lab_object.id)
         else:
-            instances = instance_m.list_my_instances()
-        lab_object.instances = [i for i in instances if i.tenant_id == lab_object.id]
+            lab_object.instances = instance_m.list_in_lab(lab_object.id,
+                                                          current_user.user_id)
 
+        images_by_id = image_m.get_many(
+            image_descriptor[0] for image_descriptor in lab_object.img_list)
         images = []
         image_amounts = []
         for image_descriptor in lab_object.img_list:
-            images.append(image_m.get(image_descriptor[0]))
+            images.append(images_by_id[image_descriptor[0]])
             image_amounts.append(image_descriptor[1])
 
         image_descriptors = zip(images, image_amounts)
@@ -195,10 +196,10 @@ def active_vm():
     # Get all instances
     instance_m = InstanceManager(session=current_user.session)
     if current_user.role == 'admin':
-        instances = instance_m.list(search_opts={'all_tenants': True})
+        instances = instance_m.list_all()
     elif current_user.role == 'teacher':
-        i_list = instance_m.list(search_opts={'all_tenants': True})
-        instances = [i for i in i_list if i.name.split('|')[0] in courses_names]
+        instances = [i for name in set(courses_names)
+                     for i in instance_m.list_named(name + '|')]
     else:
         instances = instance_m.list_my_instances()
 
@@ -234,11 +235,12 @@ def snapshot_factory():
 
     factory_name = 'snapshotFactory|{}'.format(current_user.email)
     snapshot_lab = lab_m.find(name=factory_name)
-    flavors = flavor_m.list()
     current_flavor = ''
     if snapshot_lab.flavor != '':
-        current_flavor = list(filter(lambda x: x.name == snapshot_lab.flavor, flavors))[0]
-        flavors = [flavor for flavor in flavors if flavor.disk >= current_flavor.disk]
+        current_flavor = flavor_m.find(name=snapshot_lab.flavor)
+        flavors = flavor_m.at_least(disk=current_flavor.disk)
+    else:
+        flavors = flavor_m.list()
 
     session = authenticate(
         credentials=current_user.token,
@@ -12,6 +12,7 @@ import flask
 from flask_login import login_required, current_user, login_user
 from keystoneauth1 import exceptions as ksa_exceptions
 
+from resela.backend.classes.SessionStore import regenerate
 from resela.backend.managers.CourseManager import CourseManager
 from resela.backend.managers.ErrorManager import error_handling
 from resela.backend.managers.GroupManager import GroupManager
@@ -19,7 +20,8 @@ from resela.backend.managers.LabManager import LabManager
 from resela.backend.managers.MikrotikManager import MikrotikManager
 from resela.backend.managers.RoleManager import requires_roles
 from resela.backend.managers.UserManager import UserManager
-from resela.model.User import User, authenticate as user_authenticate
+from resela.model.User import User, authenticate as user_authenticate, \
+    cache_login, forget_token, invalidate_user
 
 edit = flask.Blueprint('edit', __name__, url_prefix='/edit')
 LOG = logging.getLogger(__name__)
@@ -79,15 +81,18 @@ def user(user_id):
     course_manager = CourseManager(current_user.session)
     group_manager = GroupManager(current_user.session)
 
-    enrolled_courses = [course for course in course_manager.list_courses()
-                        if course_manager.check_in_course(user_id, course.id)]
+    memberships = course_manager.courses_for_users([user_id, current_user.user_id])
+    all_courses = course_manager.list_courses()
 
-    courses = [course for course in course_manager.list_courses()
+    enrolled_courses = [course for course in all_courses
+                        if course.id in memberships[user_id]]
+
+    courses = [course for course in all_courses
                if course not in enrolled_courses]
 
     if current_user.role == 'teacher':
         courses = [course for course in courses
-                   if course_manager.check_in_course(current_user.user_id, course.id)]
+                   if course.id in memberships[current_user.user_id]]
 
     edit_user = user_manager.get(user_id)
     if 'students' in [group.name for group in group_manager.list(user=edit_user.id)]:
@@ -147,6 +152,7 @@ def user_save():
             if user_id and first_name and surname:
                 user = user_m.get(user=user_id)
                 user_m.update(user, first_name=first_name, last_name=surname)
+                invalidate_user(user_id)
                 flask.flash('Successfully updated username.', 'success')
                 return flask.jsonify(success=True)
 
@@ -189,9 +195,12 @@ def user_save():
             'role': session.auth.auth_ref['roles'][0]['name'],
         }
 
-        session_user = User(**session_user_kwargs)
+        # The old token is dropped before `login_user` replaces `current_user`.
+        forget_token(current_user.token['X-Auth-Token'])
+        session_user = User(session=session, **session_user_kwargs)
+        regenerate(flask.session)
         login_user(session_user)
-        flask.session['session'] = json.dumps(session.get_auth_headers())
+        flask.session['session'] = json.dumps(cache_login(session, session_user))
 
         return flask.jsonify(success=True)
 
@@ -5,14 +5,39 @@ SystemStats.py
 
 """
 
+import threading
+from collections import Counter
+
 from flask_login import current_user
-from novaclient.client import Client
 
+from resela.app import APP
+from resela.backend.classes.ClientFactory import ClientFactory
+from resela.backend.classes.TTLCache import TTLCache
 from resela.backend.managers.CourseManager import CourseManager
 from resela.backend.managers.InstanceManager import InstanceManager
 from resela.backend.managers.ImageManager import ImageManager
 from resela.backend.managers.LabManager import LabManager
 
+_DASHBOARD_CACHE = None
+_DASHBOARD_CACHE_LOCK = threading.Lock()
+
+
+def dashboard_cache():
+    """Retrieve the process-wide cache of teacher dashboards.
+
+    :return: The dashboards, keyed by the user id of the teacher.
+    :rtype: `TTLCache`
+    """
+
+    global _DASHBOARD_CACHE
+
+    if _DASHBOARD_CACHE is None:
+        with _DASHBOARD_CACHE_LOCK:
+            if _DASHBOARD_CACHE is None:
+                _DASHBOARD_CACHE = TTLCache(
+                    maxsize=256, ttl=APP.iniconfig['resela'].getint('dashboard_ttl'))
+    return _DASHBOARD_CACHE
+
 
 class SystemStatus:
     """
@@ -27,7 +52,7 @@ class SystemStatus:
         :return: Dict containing the various variables used on the index page.
         """
 
-        client = Client(session=current_user.session, version='2')
+        client = ClientFactory.nova(current_user.session)
         hypervisors = client.hypervisors.list()
         system_wide_stats = {
             'ram': {
@@ -81,11 +106,35 @@ class SystemStatus:
 
         return system_stats
 
+    @staticmethod
+    def count_instances(instances):
+        """Count instances per lab and status in a single pass.
+
+        :param instances: The instances to count.
+        :type instances: `list`
+        :return: Maps the id of a lab to a `Counter` of instance statuses.
+        :rtype: `dict`
+        """
+
+        counts = {}
+        for instance in instances:
+            counts.setdefault(instance.tenant_id, Counter())[instance.status] += 1
+        return counts
+
     @staticmethod
     def get_for_teacher():
+        """
+        Retrieves the state of the teacher's courses, shown on the index page.
 
-        def instance_filter(instance):
-            return instance.tenant_id == lab.id
+        Every server is listed once, and counted per lab and status. The result
+        is cached for `dashboard_ttl` seconds per teacher.
+        :return: Dict containing the various variables used on the index page.
+        """
+
+        cache = dashboard_cache()
+        system_status = cache.get(current_user.user_id)
+        if system_status is not None:
+            return system_status
 
         # get courses and labs students and instances
         course_manager = CourseManager(current_user.session)
@@ -98,6 +147,9 @@ class SystemStatus:
                        course_manager.get_course_names(current_user.user_id)
                        if name not in ignore_course]
 
+        counts = SystemStatus.count_instances(
+            instance_m.list(search_opts={'all_tenants': True}))
+
         labs_total = 0
         labs_active = 0
 
@@ -110,20 +162,17 @@ class SystemStatus:
             course.inst_active = 0
             course.inst_suspended = 0
             course.inst_shutdown = 0
+            course.inst_error = 0
             course.labs_active = 0
             for lab in course.labs:
-                search_opts = {'all_tenants': True}
-                lab.instances = 0
-                for instance in filter(instance_filter, instance_m.list(search_opts=search_opts)):
-                    lab.instances += 1
-                    inst_total += 1
-                    if instance.status == 'ACTIVE':
-                        course.inst_active += 1
-                        inst_active += 1
-                    elif instance.status == 'SUSPENDED':
-                        course.inst_suspended += 1
-                    elif instance.status == 'SHUTOFF':
-                        course.inst_shutdown += 1
+                lab_counts = counts.get(lab.id, Counter())
+                lab.instances = sum(lab_counts.values())
+                inst_total += lab.instances
+                inst_active += lab_counts['ACTIVE']
+                course.inst_active += lab_counts['ACTIVE']
+                course.inst_suspended += lab_counts['SUSPENDED']
+                course.inst_shutdown += lab_counts['SHUTOFF']
+                course.inst_error += lab_counts['ERROR']
                 if lab.instances > 0:
                     course.labs_active += 1
                     labs_active += 1
@@ -133,7 +182,7 @@ class SystemStatus:
 
         system_status = {'courses': courses, 'labs_active': labs_active, 'labs_total':
                          labs_total, 'inst_total': inst_total, 'inst_active': inst_active}
-        return system_status
+        return cache.set(current_user.user_id, system_status)
 
     @staticmethod
     def get_for_student():
@@ -3,16 +3,37 @@ User.py
 *******
 """
 
+import hashlib
 import json
+import logging
+import threading
+import time
 
 from flask import session as flask_session
 from flask_login import UserMixin, AnonymousUserMixin
+from itsdangerous import URLSafeTimedSerializer, BadData
 from keystoneauth1 import session
+from keystoneclient import access
 from keystoneclient.auth.identity import v3
+from keystoneclient.auth.identity.access import AccessInfoPlugin
 
 from resela.app import APP, LOGIN_MANAGER
+from resela.backend.classes.ConnectionPool import http_session
+from resela.backend.classes.ServiceCatalog import service_catalog
+from resela.backend.classes.SessionRegistry import SessionRegistry
+from resela.backend.classes.SessionStore import shared_store
+from resela.backend.classes.TokenCache import TokenCache
+from resela.backend.classes.TokenRefresher import TokenRefresher
 from resela.backend.managers.UserManager import UserManager
 
+LOG = logging.getLogger(__name__)
+
+_TOKEN_CACHE = None
+_SESSION_REGISTRY = None
+_TOKEN_REFRESHER = None
+_CACHE_LOCK = threading.Lock()
+_SESSION_REGISTRY_LOCK = threading.Lock()
+
 
 class User(UserMixin):
     """Store user information.
@@ -38,6 +59,9 @@ class User(UserMixin):
         :type surname: `str`
         :param role: A user's role.
         :type role: `str`
+        :param session: An authenticated OpenStack session. When not given, \
+            one is created from `token` upon first use.
+        :type session: `keystoneauth1.session.Session`
         """
 
         self.user_id = user_id
@@ -46,18 +70,43 @@ class User(UserMixin):
         self.name = name
         self.surname = surname
         self.role = role
+        self._session = session
+
+    @property
+    def session(self):
+        """Retrieve the user's OpenStack session.
+
+        A user loaded from a profile snapshot is not authenticated against
+        Keystone until a page actually needs the session.
+        """
+
+        if self._session is None and self.token is not None:
+            self._session = authenticate(self.token)
+            token_cache().put(self.token['X-Auth-Token'], self._session,
+                              self.profile, self.role)
+            share_token(self.token['X-Auth-Token'], self._session,
+                        self.profile, self.role)
+        return self._session
 
-        if token is not None:
-            sess = authenticate(token)
-            self.session = sess
-        else:
-            self.session = session
+    @session.setter
+    def session(self, value):
+        self._session = value
 
     @property
     def full_name(self):
         """Retrieve a user's full name."""
         return self.name + ' ' + self.surname
 
+    @property
+    def profile(self):
+        """Retrieve the attributes that describe the user, excluding the role."""
+        return {
+            'user_id': self.user_id,
+            'email': self.email,
+            'name': self.name,
+            'surname': self.surname
+        }
+
     def get_id(self):
         """Retrieve the user's id.
 
@@ -82,13 +131,18 @@ class AnonymousUser(AnonymousUserMixin, User):
 
 
 def authenticate(credentials, user_domain_name='Default',
-                 project_domain_name='Default', project_name='Default'):
+                 project_domain_name='Default', project_name='Default', fresh=False):
     """Authenticate a user with either a password or a token.
 
     The occasion on which one authenticates with a username-password pair is
     the initial login. All future calls should authenticate with the token
     received from OpenStack.
 
+    Sessions authenticated with a token are kept in the session registry, so
+    that scoping the same token to the same project again reuses the session
+    instead of asking Keystone for a new token. They are published in the
+    shared store as well, for the other workers to reuse.
+
     :param credentials: Login credentials.
     :type credentials: `dict`, either {'username': x, 'password': y } or {'X-Auth-Token': z}
     :param user_domain_name: User's domain name for authentication.
@@ -97,6 +151,9 @@ def authenticate(credentials, user_domain_name='Default',
     :type project_domain_name: `str`
     :param project_name: Project name for project scoping.
     :type project_name: `str`
+    :param fresh: Whether to scope a token anew rather than reuse a session \
+        scoped from it before.
+    :type fresh: `bool`
     :return: An authenticated OpenStack session.
     :rtype: `keystone1.session.Session`
 
@@ -121,6 +178,19 @@ def authenticate(credentials, user_domain_name='Default',
     # in a `X-Auth-Token` field.
     elif 'X-Auth-Token' in credentials:
         token = credentials['X-Auth-Token']
+        shared_key = 'scoped:%s:%s:%s' % (_token_digest(token),
+                                          project_domain_name, project_name)
+        if not fresh:
+            scoped_session = session_registry().get(token, project_domain_name,
+                                                    project_name)
+            if scoped_session is not None:
+                return scoped_session
+
+            scoped_session, _ = _shared_session(shared_key)
+            if scoped_session is not None:
+                return session_registry().put(token, project_domain_name,
+                                              project_name, scoped_session)
+
         auth = v3.Token(
             auth_url=APP.iniconfig.get('openstack', 'keystone'),
             token=token,
@@ -132,18 +202,340 @@ def authenticate(credentials, user_domain_name='Default',
         raise TypeError('No credentials provided.', credentials)
 
     cert_path = APP.iniconfig.get('openstack', 'cert_path')
-    sess = session.Session(auth=auth, verify=cert_path)
+    sess = session.Session(auth=auth, verify=cert_path, session=http_session(),
+                           timeout=_request_timeout(),
+                           discovery_cache=service_catalog().discovery_cache)
 
     # Check if authentication succeeds. Raises an error upon failure.
     sess.get_token()
 
+    if 'X-Auth-Token' in credentials:
+        session_registry().put(credentials['X-Auth-Token'], project_domain_name,
+                               project_name, sess)
+        _share_session(shared_key, sess)
+
     return sess
 
 
+def _share_session(key, os_session, **extra):
+    """Publish a session in the shared store, until its token nears expiry.
+
+    Only the token and its body are stored, from which any worker rebuilds
+    the session without contacting Keystone.
+
+    :param key: Key of the session in the store.
+    :type key: `str`
+    :param os_session: An authenticated session.
+    :type os_session: `keystoneauth1.session.Session`
+    :param extra: Further JSON serializable values stored along.
+    """
+
+    auth_ref = getattr(os_session.auth, 'auth_ref', None)
+    expires_at = TokenCache.expires_at(os_session)
+    if not isinstance(auth_ref, dict) or expires_at is None:
+        # Only sessions holding the body of a Keystone token can be rebuilt.
+        return
+
+    ttl = expires_at - APP.iniconfig['openstack'].getint('token_expiry_margin') \
+        - time.time()
+    if ttl > 0:
+        extra.update(token=auth_ref.auth_token, body=dict(auth_ref))
+        shared_store().set(key, json.dumps(extra), ttl=ttl)
+
+
+def _shared_session(key):
+    """Rebuild a session published in the shared store.
+
+    :param key: Key of the session in the store.
+    :type key: `str`
+    :return: The session and the extra values stored along, or `None`s.
+    :rtype: `tuple`
+    """
+
+    data = shared_store().get(key)
+    if data is None:
+        return None, None
+
+    data = json.loads(data)
+    # The AccessInfo of keystoneclient, as obtained upon authentication, is a
+    # dict the blueprints index, e.g. `auth_ref['roles']`.
+    auth_ref = access.AccessInfo.factory(body={'token': data.pop('body')},
+                                         auth_token=data.pop('token'))
+    return _token_session(auth_ref), data
+
+
+def _token_session(auth_ref):
+    """Build a session authenticated with a token only, from its auth reference.
+
+    :param auth_ref: The token and its body.
+    :type auth_ref: `keystoneclient.access.AccessInfo`
+    :rtype: `keystoneauth1.session.Session`
+    """
+
+    cert_path = APP.iniconfig.get('openstack', 'cert_path')
+    return session.Session(auth=AccessInfoPlugin(auth_ref), verify=cert_path,
+                           session=http_session(), timeout=_request_timeout(),
+                           discovery_cache=service_catalog().discovery_cache)
+
+
+def _request_timeout():
+    """Seconds an OpenStack request may take, `None` to wait forever."""
+
+    return APP.iniconfig.getfloat('openstack', 'request_timeout') or None
+
+
+def token_cache():
+    """Retrieve the process-wide cache of validated tokens.
+
+    The cache is created upon first use, sized according to the `[openstack]`
+    section of the configuration. The token refresher is started along with
+    it, unless `token_refresh_interval` is 0.
+
+    :return: The token cache.
+    :rtype: `TokenCache`
+    """
+
+    global _TOKEN_CACHE, _TOKEN_REFRESHER
+
+    if _TOKEN_CACHE is None:
+        with _CACHE_LOCK:
+            if _TOKEN_CACHE is None:
+                config = APP.iniconfig['openstack']
+                _TOKEN_CACHE = TokenCache(
+                    maxsize=config.getint('token_cache_size'),
+                    ttl=config.getint('token_cache_ttl'),
+                    margin=config.getint('token_expiry_margin')
+                )
+                if config.getint('token_refresh_interval'):
+                    _TOKEN_REFRESHER = TokenRefresher(
+                        _TOKEN_CACHE, session_registry(), rescope,
+                        interval=config.getint('token_refresh_interval'),
+                        window=config.getint('token_refresh_window')
+                    )
+                    _TOKEN_REFRESHER.start()
+    return _TOKEN_CACHE
+
+
+def session_registry():
+    """Retrieve the process-wide registry of project scoped sessions.
+
+    :return: The session registry.
+    :rtype: `SessionRegistry`
+    """
+
+    global _SESSION_REGISTRY
+
+    if _SESSION_REGISTRY is None:
+        with _SESSION_REGISTRY_LOCK:
+            if _SESSION_REGISTRY is None:
+                config = APP.iniconfig['openstack']
+                _SESSION_REGISTRY = SessionRegistry(
+                    maxsize=config.getint('scoped_session_cache_size'),
+                    ttl=config.getint('scoped_session_ttl'),
+                    margin=config.getint('token_expiry_margin')
+                )
+    return _SESSION_REGISTRY
+
+
+def rescope(token, domain='Default', project='Default'):
+    """Scope a still-valid token to a project anew, e.g. to renew a cached session.
+
+    :param token: The `X-Auth-Token` value.
+    :type token: `str`
+    :param domain: Name of the project's domain.
+    :type domain: `str`
+    :param project: Name of the project.
+    :type project: `str`
+    :return: An authenticated, scoped session.
+    :rtype: `keystoneauth1.session.Session`
+    """
+
+    return authenticate(credentials={'X-Auth-Token': token}, project_domain_name=domain,
+                        project_name=project, fresh=True)
+
+
+def forget_token(token):
+    """Drop every cached session derived from a token, e.g. upon logout.
+
+    :param token: The `X-Auth-Token` value.
+    :type token: `str`
+    """
+
+    token_cache().invalidate(token)
+    session_registry().invalidate_token(token)
+    shared_store().delete('token:' + _token_digest(token))
+
+
+def share_token(token, os_session, profile, role):
+    """Publish a validated token in the shared store.
+
+    Any worker that does not hold the token in its token cache then rebuilds
+    the session from the store instead of validating the token again.
+
+    :param token: The `X-Auth-Token` value.
+    :type token: `str`
+    :param os_session: The session the token was validated with.
+    :type os_session: `keystoneauth1.session.Session`
+    :param profile: The user attributes, as passed to `model.User`.
+    :type profile: `dict`
+    :param role: The role of the user.
+    :type role: `str`
+    """
+
+    _share_session('token:' + _token_digest(token), os_session,
+                   profile=profile, role=role, issued_at=time.time())
+
+
+def shared_token(token):
+    """Retrieve a token published in the shared store by any worker.
+
+    :param token: The `X-Auth-Token` value.
+    :type token: `str`
+    :return: The rebuilt session, profile and role, with the time they were \
+        published, or `None`.
+    :rtype: `tuple`
+    """
+
+    os_session, data = _shared_session('token:' + _token_digest(token))
+    if os_session is None or \
+            _profile_changed(data['profile']['user_id'], data['issued_at']):
+        return None
+    return os_session, data['profile'], data['role'], data['issued_at']
+
+
+def _profile_changed(user_id, since):
+    """Check whether the profile of a user changed after the time `since`."""
+
+    changed_at = shared_store().get('profile-changed:' + user_id)
+    return changed_at is not None and since <= float(changed_at)
+
+
+def _profile_serializer():
+    """Retrieve the serializer signing profile snapshots."""
+
+    return URLSafeTimedSerializer(APP.iniconfig.get('flask', 'secret_key'),
+                                  salt='resela-profile')
+
+
+def _token_digest(token):
+    """Digest of an `X-Auth-Token`, binding a snapshot to its token."""
+
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def store_profile(token, os_session, user):
+    """Store a signed snapshot of a user's profile and role in the Flask session.
+
+    :param token: The `X-Auth-Token` value the snapshot is bound to.
+    :type token: `str`
+    :param os_session: The session the token was validated with.
+    :type os_session: `keystoneauth1.session.Session`
+    :param user: The user whose profile is stored, or its `CachedToken`.
+    :type user: `model.User`
+    """
+
+    flask_session['profile'] = _profile_serializer().dumps({
+        'profile': user.profile,
+        'role': user.role,
+        'token': _token_digest(token),
+        'expires_at': TokenCache.expires_at(os_session),
+        'issued_at': time.time()
+    })
+
+
+def load_profile(token, user_id):
+    """Retrieve the profile snapshot of the Flask session, if still valid.
+
+    A snapshot is valid when its signature checks out, it belongs to `user_id`
+    and `token`, it is younger than the revalidation interval, its token is
+    not about to expire, and the user's profile has not changed since.
+
+    :param token: The `X-Auth-Token` of the request.
+    :type token: `str`
+    :param user_id: Id of the user being loaded.
+    :type user_id: `str`
+    :return: The profile and role, or `None`.
+    :rtype: `tuple`
+    """
+
+    if 'profile' not in flask_session:
+        return None
+
+    config = APP.iniconfig['openstack']
+    try:
+        snapshot = _profile_serializer().loads(
+            flask_session['profile'], max_age=config.getint('profile_ttl'))
+    except BadData:
+        return None
+
+    if snapshot['profile'].get('user_id') != user_id or \
+            snapshot['token'] != _token_digest(token):
+        return None
+
+    expires_at = snapshot['expires_at']
+    if expires_at is not None and \
+            expires_at - config.getint('token_expiry_margin') <= time.time():
+        return None
+
+    if _profile_changed(user_id, snapshot['issued_at']):
+        return None
+
+    return snapshot['profile'], snapshot['role']
+
+
+def invalidate_user(user_id):
+    """Forget everything cached about a user, e.g. after a change of name.
+
+    The change is marked in the shared store, which every worker consults
+    before serving the user from its caches. Only the `redis` session
+    backend shares the store between processes; with the `cookie` and
+    `memory` backends, the other workers keep the old profile until their
+    entries lapse, after `token_cache_ttl` or `profile_ttl` seconds.
+
+    :param user_id: OpenStack id of the user.
+    :type user_id: `str`
+    """
+
+    token_cache().invalidate_user(user_id)
+    # Kept for a day, outliving any token issued before the change.
+    shared_store().set('profile-changed:' + user_id, str(time.time()),
+                       ttl=86400)
+
+
+def cache_login(os_session, user):
+    """Remember the session of a user that has just logged in.
+
+    The next request carrying the returned headers is served from the token
+    cache, without validating the token against Keystone again. A signed
+    profile snapshot is stored in the Flask session as well, for the workers
+    whose token cache does not hold the token. Only the token is kept, not
+    the password the user logged in with.
+
+    :param os_session: The session the user authenticated with.
+    :type os_session: `keystoneauth1.session.Session`
+    :param user: The logged in user.
+    :type user: `model.User`
+    :return: The authentication headers to be stored in the Flask session.
+    :rtype: `dict`
+    """
+
+    headers = os_session.get_auth_headers()
+    os_session = _token_session(os_session.auth.auth_ref)
+    token_cache().put(headers['X-Auth-Token'], os_session, user.profile, user.role)
+    share_token(headers['X-Auth-Token'], os_session, user.profile, user.role)
+    store_profile(headers['X-Auth-Token'], os_session, user)
+    return headers
+
+
 @LOGIN_MANAGER.user_loader
 def load_user(user_id):
     """Load a user to be set as the `current_user`.
 
+    The user is taken from the token cache, or else from the shared store,
+    or else from the signed profile snapshot of the Flask session, in which
+    case the OpenStack session is only created when needed. Keystone is
+    asked for the user only when none of them holds it.
+
     According to the specification, `None` should be returned when
     a user with the provided user id cannot be retrieved. A return value of
     `None` will invalidate the Flask session, and Flask-Login will discard it,
@@ -158,22 +550,41 @@ def load_user(user_id):
 
     try:
         token = json.loads(flask_session['session'])
-        os_session = authenticate(credentials=token)
-        user_m = UserManager(session=os_session)
-        user = user_m.get(user=user_id)
-
-        session_user_kwargs = {
-            'user_id': user.id,
-            'email': user.name,
-            'name': user.first_name,
-            'surname': user.last_name,
-            'role': os_session.auth.auth_ref['roles'][0]['name'],
-            'token': json.loads(flask_session['session'])
-        }
-
-        return User(**session_user_kwargs)
-    except:
-        # TODO(vph): Add debug log message.
+        cache = token_cache()
+        cached = cache.get(token['X-Auth-Token'])
+
+        if cached is None or cached.profile['user_id'] != user_id or \
+                _profile_changed(user_id, cached.issued_at):
+            cached = None
+            shared = shared_token(token['X-Auth-Token'])
+            if shared is not None and shared[1]['user_id'] == user_id:
+                cached = cache.put(token['X-Auth-Token'], *shared)
+
+        if cached is None:
+            snapshot = load_profile(token['X-Auth-Token'], user_id)
+            if snapshot is not None:
+                profile, role = snapshot
+                return User(token=token, role=role, **profile)
+
+            os_session = authenticate(credentials=token)
+            user_m = UserManager(session=os_session)
+            user = user_m.get(user=user_id)
+
+            profile = {
+                'user_id': user.id,
+                'email': user.name,
+                'name': user.first_name,
+                'surname': user.last_name
+            }
+            role = os_session.auth.auth_ref['roles'][0]['name']
+            cached = cache.put(token['X-Auth-Token'], os_session, profile, role)
+            share_token(token['X-Auth-Token'], os_session, profile, role)
+            store_profile(token['X-Auth-Token'], os_session, cached)
+
+        return User(token=token, session=cached.session, role=cached.role,
+                    **cached.profile)
+    except Exception:
+        LOG.debug('Unable to load user %s.', user_id, exc_info=True)
         return None
 
 # TODO(vph): Moved from `app.py` so that it does not cause import cycles;
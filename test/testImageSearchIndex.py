@@ -0,0 +1,80 @@
+"""
+Test for the ImageSearchIndex
+"""
+from types import SimpleNamespace
+from unittest import TestCase
+
+from resela.backend.classes.ImageSearchIndex import ImageSearchIndex
+
+
+def image(image_id, name, keywords, os='Ubuntu', flavor_name='m1.small', checksum=None):
+    """ Create a stand-in for a Glance image. """
+    return SimpleNamespace(id=image_id, name=name, keywords=keywords, os=os,
+                           version='16.04', flavor_name=flavor_name, internet='True',
+                           checksum=checksum)
+
+
+class TestImageSearchIndex(TestCase):
+    """ Test class for the image search index. """
+
+    def setUp(self):
+        """ Test setup. """
+        self.index = ImageSearchIndex()
+        self.index.refresh(lambda: [
+            image('a', 'imageLibrary|default|web', 'web,apache', checksum='f00'),
+            image('b', 'imageLibrary|images|db', 'sql', os='CentOS'),
+            image('c', 'imageLibrary|snapshots|lamp', 'web,sql', flavor_name='m1.large')
+        ])
+
+    def test_search(self):
+        """ Searches by keywords and facets.
+
+        Expected result the images having any keyword and every facet value.
+        """
+        self.assertEqual(self.index.search(), ['a', 'b', 'c'])
+        self.assertEqual(self.index.search(keywords=['Web']), ['a', 'c'])
+        self.assertEqual(self.index.search(keywords=['web', 'sql'], os='Ubuntu'), ['a', 'c'])
+        self.assertEqual(self.index.search(keywords=[''], library='images'), ['b'])
+        self.assertEqual(self.index.search(keywords=['sql'], flavor='m1.small'), ['b'])
+
+    def test_facet_counts(self):
+        """ Counts the images matching a search per facet value.
+
+        Expected result the counts of the matching images only.
+        """
+        counts = self.index.facet_counts(keywords=['sql'])
+        self.assertEqual(counts['os'], {'CentOS': 1, 'Ubuntu': 1})
+        self.assertEqual(counts['library'], {'images': 1, 'snapshots': 1})
+
+    def test_update_and_remove(self):
+        """ Reindexes an updated image and removes a deleted one.
+
+        Expected result searches reflect the changes.
+        """
+        self.index.add(image('a', 'imageLibrary|default|web', 'nginx'))
+        self.index.remove('b')
+        self.assertEqual(self.index.search(keywords=['web']), ['c'])
+        self.assertEqual(self.index.search(keywords=['nginx']), ['a'])
+        self.index.add(image('d', 'imageLibrary|images|new', 'sql'))
+        self.assertEqual(sorted(self.index.search(keywords=['sql'])), ['c', 'd'])
+
+    def test_checksum(self):
+        """ Looks images up by checksum, before and after a deletion.
+
+        Expected result the image is found until it is removed.
+        """
+        self.assertEqual(self.index.with_checksum('f00'), ['a'])
+        self.assertEqual(self.index.with_checksum('bar'), [])
+        self.index.remove('a')
+        self.assertEqual(self.index.with_checksum('f00'), [])
+
+    def test_invalidate(self):
+        """ Invalidates a fresh index.
+
+        Expected result the next refresh lists the images anew.
+        """
+        self.index.refresh(lambda: [image('e', 'imageLibrary|images|other', 'ftp')])
+        self.assertEqual(self.index.search(), ['a', 'b', 'c'])
+        self.index.invalidate()
+        self.index.refresh(lambda: [image('e', 'imageLibrary|images|other', 'ftp')])
+        self.assertEqual(self.index.search(), ['e'])
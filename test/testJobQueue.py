@@ -0,0 +1,37 @@
+"""
+Test for the JobQueue
+"""
+import threading
+from unittest import TestCase
+
+from resela.backend.classes.JobQueue import Job, JobQueue
+
+
+class TestJobQueue(TestCase):
+    """ Test class for the job queue. """
+
+    def test_same_key(self):
+        """ Submits a job twice with the same key while the first one runs.
+
+        Expected result the running job is returned, and a job is queued
+        again once it finished.
+        """
+        queue = JobQueue(workers=2, ttl=60)
+        release = threading.Event()
+        runs = []
+
+        def task(job):
+            runs.append(job.id)
+            release.wait(5)
+
+        first = queue.submit('u1', 'launch_lab', task, key='u1:lab1')
+        self.assertIs(queue.submit('u1', 'launch_lab', task, key='u1:lab1'), first)
+        other = queue.submit('u1', 'launch_lab', task, key='u1:lab2')
+        self.assertIsNot(other, first)
+
+        release.set()
+        queue._executor.shutdown(wait=True)
+        self.assertEqual(queue.status(first.id, owner='u1')['status'], Job.DONE)
+        self.assertIsNone(queue.status(first.id, owner='u2'))
+        self.assertEqual(sorted(runs), sorted([first.id, other.id]))
+        self.assertEqual(queue._pending, {})
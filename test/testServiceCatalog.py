@@ -0,0 +1,109 @@
+"""
+Test for the ServiceCatalog
+"""
+import json
+import os
+from unittest import TestCase
+
+import requests
+from keystoneauth1 import session
+from keystoneclient.auth.identity import v3
+from requests.adapters import BaseAdapter
+
+from resela.app import app_init
+
+KEYSTONE = 'http://keystone:5000/v3'
+NOVA = 'http://nova:8774/v2.1'
+
+TOKEN = {
+    'token': {
+        'methods': ['token'],
+        'expires_at': '2999-01-01T00:00:00.000000Z',
+        'issued_at': '2000-01-01T00:00:00.000000Z',
+        'user': {'id': 'u1', 'name': 'a@resela.eu',
+                 'domain': {'id': 'default', 'name': 'Default'}},
+        'project': {'id': 'p1', 'name': 'lab',
+                    'domain': {'id': 'default', 'name': 'Default'}},
+        'roles': [{'id': 'r1', 'name': 'student'}],
+        'catalog': [{
+            'id': 'c1', 'type': 'compute', 'name': 'nova',
+            'endpoints': [{'id': 'e1', 'interface': 'public', 'region': 'RegionOne',
+                           'region_id': 'RegionOne', 'url': NOVA + '/p1'}]
+        }]
+    }
+}
+
+
+class Controller(BaseAdapter):
+    """ Stand-in for Keystone and Nova, answering with canned documents. """
+
+    def __init__(self, nova_version):
+        super().__init__()
+        self.nova_version = nova_version
+        self.urls = []
+
+    def send(self, request, **kwargs):
+        self.urls.append(request.url)
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.headers['Content-Type'] = 'application/json'
+        if request.url == KEYSTONE + '/auth/tokens':
+            response.status_code = 201
+            response.headers['X-Subject-Token'] = 'scoped'
+            body = TOKEN
+        elif request.url.rstrip('/') == NOVA and self.nova_version:
+            response.status_code = 200
+            body = {'version': {'id': 'v2.1', 'status': 'CURRENT', 'min_version': '2.1',
+                                'version': self.nova_version, 'links': []}}
+        else:
+            response.status_code = 404
+            body = {'error': {'code': 404, 'message': 'Not found'}}
+        response._content = json.dumps(body).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+def token_session(controller):
+    """ Build a session authenticated with a keystoneclient token plugin. """
+    http = requests.Session()
+    http.mount('http://', controller)
+    auth = v3.Token(auth_url=KEYSTONE, token='unscoped', project_id='p1')
+    return session.Session(auth=auth, session=http)
+
+
+class TestServiceCatalog(TestCase):
+    """ Test class for the service catalog. """
+
+    @classmethod
+    def setUpClass(cls):
+        # Initialize Resela's Flask app.
+        os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../'))
+        app_init()
+
+    def setUp(self):
+        """ Test setup. """
+        from resela.backend.classes.ServiceCatalog import service_catalog
+        self.catalog = service_catalog()
+        self.catalog.refresh()
+
+    def test_manager_on_token_session(self):
+        """ Builds an instance manager on a keystoneclient token session.
+
+        Expected result the microversion is capped to the one of the controller.
+        """
+        from resela.backend.managers.InstanceManager import InstanceManager
+        controller = Controller('2.10')
+        instance_m = InstanceManager(session=token_session(controller))
+        self.assertEqual(instance_m.api.api_version.get_string(), '2.10')
+        self.assertIn(NOVA, controller.urls)
+
+    def test_discovery_failure(self):
+        """ Negotiates the microversion with a controller without version document.
+
+        Expected result the configured microversion.
+        """
+        version = self.catalog.api_version(token_session(Controller(None)), 'compute', '2.19')
+        self.assertEqual(version, '2.19')
@@ -0,0 +1,123 @@
+"""
+Test for the SessionStore
+"""
+from unittest import TestCase
+
+import flask
+
+from resela.backend.classes.SessionStore import MemoryStore, RedisStore, \
+    ServerSideSessionInterface, regenerate
+
+
+class FakeRedis:
+    """ Local stand-in for a Redis client, ignoring expiry. """
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value.encode('utf-8')
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class TestSessionStore(TestCase):
+    """ Test class for the server side session store. """
+
+    def setUp(self):
+        """ Test setup. """
+        self.redis = FakeRedis()
+        self.app = flask.Flask(__name__)
+        self.app.secret_key = 'secret'
+        self.app.session_interface = ServerSideSessionInterface(RedisStore(self.redis))
+
+        @self.app.route('/set')
+        def set_value():
+            flask.session['session'] = '{"X-Auth-Token": "token"}'
+            return ''
+
+        @self.app.route('/get')
+        def get_value():
+            return flask.session.get('session', '')
+
+        @self.app.route('/login')
+        def login():
+            regenerate(flask.session)
+            flask.session['user'] = 'u1'
+            return ''
+
+        @self.app.route('/clear')
+        def clear():
+            flask.session.clear()
+            return ''
+
+    def test_memory_store(self):
+        """ Stores a value with a lifetime in the past.
+
+        Expected result the value is not returned, while others are.
+        """
+        store = MemoryStore(maxsize=10, ttl=60)
+        store.set('a', '1')
+        store.set('b', '2', ttl=-1)
+        self.assertEqual(store.get('a'), '1')
+        self.assertIsNone(store.get('b'))
+
+    def test_shared_session(self):
+        """ Stores a value in the session and reads it with another client.
+
+        Expected result the cookie holds the session id only, and any client
+        presenting it sees the value.
+        """
+        client = self.app.test_client()
+        response = client.get('/set')
+        cookie = response.headers['Set-Cookie'].split(';')[0].split('=', 1)[1]
+        self.assertNotIn('token', cookie)
+        self.assertEqual(len(self.redis.data), 1)
+
+        other = self.app.test_client()
+        other.set_cookie('localhost', 'session', cookie)
+        self.assertEqual(other.get('/get').data, b'{"X-Auth-Token": "token"}')
+
+    def test_encrypted_values(self):
+        """ Stores a token in a store given a secret.
+
+        Expected result Redis holds the value encrypted, and a store with
+        another secret does not read it.
+        """
+        store = RedisStore(self.redis, secret='secret')
+        store.set('token:a', '{"token": "gAAAA"}')
+        self.assertNotIn(b'gAAAA"', self.redis.data['resela:token:a'])
+        self.assertEqual(store.get('token:a'), '{"token": "gAAAA"}')
+        self.assertIsNone(RedisStore(self.redis, secret='other').get('token:a'))
+
+    def test_cleared_session(self):
+        """ Clears a stored session.
+
+        Expected result the session is removed from the store.
+        """
+        client = self.app.test_client()
+        client.get('/set')
+        client.get('/clear')
+        self.assertEqual(self.redis.data, {})
+        self.assertEqual(client.get('/get').data, b'')
+
+    def test_regenerated_on_login(self):
+        """ Logs in with a session id set beforehand.
+
+        Expected result the session moves to a new id, keeping its content,
+        and the old id no longer opens it.
+        """
+        client = self.app.test_client()
+        before = client.get('/set').headers['Set-Cookie'].split(';')[0].split('=', 1)[1]
+        after = client.get('/login').headers['Set-Cookie'].split(';')[0].split('=', 1)[1]
+        self.assertNotEqual(before, after)
+        self.assertEqual(list(self.redis.data), ['resela:session:' + after])
+        self.assertEqual(client.get('/get').data, b'{"X-Auth-Token": "token"}')
+
+        other = self.app.test_client()
+        other.set_cookie('localhost', 'session', before)
+        self.assertEqual(other.get('/get').data, b'')
@@ -0,0 +1,101 @@
+"""
+Test for the StatusWatcher
+"""
+import threading
+from unittest import TestCase
+
+from resela.backend.classes.StatusWatcher import StatusWatcher
+
+
+class Source:
+    """ Stand-in for a listing, returning the statuses it is given in turn. """
+
+    def __init__(self, *ticks):
+        self.ticks = list(ticks)
+        self.calls = []
+
+    def __call__(self, ids):
+        self.calls.append(ids)
+        return self.ticks.pop(0) if len(self.ticks) > 1 else self.ticks[0]
+
+
+class TestStatusWatcher(TestCase):
+    """ Test class for the status watcher. """
+
+    def setUp(self):
+        """ Test setup. """
+        self.watcher = StatusWatcher(min_interval=0.01, max_interval=0.05, timeout=2)
+
+    def test_batches_resources_of_a_source(self):
+        """ Waits for two servers of the same source.
+
+        Expected result both reach their status, polled with one listing per tick.
+        """
+        source = Source({'a': 'BUILD', 'b': 'BUILD'}, {'a': 'ACTIVE', 'b': 'BUILD'},
+                        {'b': 'ACTIVE'})
+        first = self.watcher.watch('servers', source, 'a', 'ACTIVE', gone='DELETED')
+        second = self.watcher.watch('servers', source, 'b', 'ACTIVE', gone='DELETED')
+        self.assertEqual(first.result(timeout=2), 'ACTIVE')
+        self.assertEqual(second.result(timeout=2), 'ACTIVE')
+        self.assertIn(['a', 'b'], source.calls)
+
+    def test_stop_and_gone(self):
+        """ Waits for a server which fails and one which disappears.
+
+        Expected result the stop status and the gone status.
+        """
+        source = Source({'a': 'ERROR'})
+        self.assertEqual(self.watcher.wait('servers', source, 'a', 'ACTIVE', stop=['ERROR']),
+                         'ERROR')
+        self.assertEqual(self.watcher.wait('servers', source, 'b', 'DELETED', gone='DELETED'),
+                         'DELETED')
+
+    def test_timeout(self):
+        """ Waits for a server which never becomes active, or cannot be listed.
+
+        Expected result the last status seen, or the error of the listing.
+        """
+        source = Source({'a': 'BUILD'})
+        self.assertEqual(self.watcher.wait('servers', source, 'a', 'ACTIVE', timeout=0.1),
+                         'BUILD')
+
+        def failing(ids):
+            raise RuntimeError('Nova is down')
+
+        with self.assertRaises(RuntimeError):
+            self.watcher.wait('other', failing, 'a', 'ACTIVE', timeout=0.1)
+
+    def test_slow_source_does_not_block_others(self):
+        """ Waits for a server of a source whose listing hangs, and one of another source.
+
+        Expected result the server of the other source reaches its status meanwhile.
+        """
+        release = threading.Event()
+
+        def hanging(ids):
+            release.wait(2)
+            return {'a': 'ACTIVE'}
+
+        slow = self.watcher.watch('slow', hanging, 'a', 'ACTIVE')
+        fast = self.watcher.watch('fast', Source({'b': 'ACTIVE'}), 'b', 'ACTIVE')
+        self.assertEqual(fast.result(timeout=1), 'ACTIVE')
+        self.assertFalse(slow.done())
+        release.set()
+        self.assertEqual(slow.result(timeout=2), 'ACTIVE')
+
+    def test_rejected_token(self):
+        """ Waits for a server of a project through two callers, the latest with an expired token.
+
+        Expected result the server is listed with the token of the other caller.
+        """
+        class Unauthorized(Exception):
+            http_status = 401
+
+        def expired(ids):
+            raise Unauthorized()
+
+        first = self.watcher.watch('project', Source({'a': 'BUILD'}, {'a': 'ACTIVE'}),
+                                   'a', 'ACTIVE')
+        second = self.watcher.watch('project', expired, 'a', 'ACTIVE')
+        self.assertEqual(second.result(timeout=2), 'ACTIVE')
+        self.assertEqual(first.result(timeout=2), 'ACTIVE')
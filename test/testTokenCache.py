@@ -0,0 +1,149 @@
+"""
+Test for the TokenCache
+"""
+import datetime
+from types import SimpleNamespace
+from unittest import TestCase
+
+from resela.backend.classes.SessionRegistry import SessionRegistry
+from resela.backend.classes.TTLCache import TTLCache
+from resela.backend.classes.TokenCache import TokenCache
+from resela.backend.classes.TokenRefresher import TokenRefresher
+
+
+def fake_session(seconds_left):
+    """ Build an object resembling a session whose token expires in `seconds_left`. """
+    expires = datetime.datetime.now(datetime.timezone.utc) + \
+        datetime.timedelta(seconds=seconds_left)
+    return SimpleNamespace(auth=SimpleNamespace(auth_ref=SimpleNamespace(expires=expires)))
+
+
+class TestTokenCache(TestCase):
+    """ Test class for the token cache. """
+
+    def setUp(self):
+        """ Test setup. """
+        self.profile = {'user_id': 'u1', 'email': 'a@resela.eu', 'name': 'A', 'surname': 'B'}
+
+    def test_lru_eviction(self):
+        """ Fills a cache beyond its size.
+
+        Expected result the least recently used entry is evicted.
+        """
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_expired_entry(self):
+        """ Stores an entry with a deadline in the past.
+
+        Expected result the entry is not returned.
+        """
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1, ttl=-1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.misses, 1)
+
+    def test_valid_token(self):
+        """ Caches a token valid for an hour.
+
+        Expected result the session, profile and role are handed back.
+        """
+        cache = TokenCache(maxsize=10, ttl=300, margin=60)
+        session = fake_session(3600)
+        cache.put('token', session, self.profile, 'student')
+        entry = cache.get('token')
+        self.assertIs(entry.session, session)
+        self.assertEqual(entry.profile, self.profile)
+        self.assertEqual(entry.role, 'student')
+
+    def test_token_within_margin(self):
+        """ Caches a token that expires within the margin.
+
+        Expected result the token is not cached.
+        """
+        cache = TokenCache(maxsize=10, ttl=300, margin=60)
+        cache.put('token', fake_session(30), self.profile, 'student')
+        self.assertIsNone(cache.get('token'))
+
+    def test_invalidate_user(self):
+        """ Invalidates all tokens of a user.
+
+        Expected result only the tokens of other users remain.
+        """
+        cache = TokenCache(maxsize=10, ttl=300, margin=60)
+        cache.put('t1', fake_session(3600), self.profile, 'student')
+        cache.put('t2', fake_session(3600), dict(self.profile, user_id='u2'), 'teacher')
+        cache.invalidate_user('u1')
+        self.assertIsNone(cache.get('t1'))
+        self.assertIsNotNone(cache.get('t2'))
+
+    def test_scoped_sessions(self):
+        """ Registers sessions scoped from two tokens and forgets one token.
+
+        Expected result only the sessions of the remaining token are reused.
+        """
+        registry = SessionRegistry(maxsize=10, ttl=300, margin=60)
+        session = fake_session(3600)
+        registry.put('t1', 'DV1337', 'DV1337|lab1', session)
+        registry.put('t1', 'DV1337', 'DV1337|lab2', fake_session(3600))
+        registry.put('t2', 'DV1337', 'DV1337|lab1', fake_session(3600))
+        self.assertIs(registry.get('t1', 'DV1337', 'DV1337|lab1'), session)
+        registry.invalidate_token('t1')
+        self.assertIsNone(registry.get('t1', 'DV1337', 'DV1337|lab1'))
+        self.assertIsNone(registry.get('t1', 'DV1337', 'DV1337|lab2'))
+        self.assertIsNotNone(registry.get('t2', 'DV1337', 'DV1337|lab1'))
+
+    def test_expiring_entries(self):
+        """ Lists the entries expiring soon, of which one was read.
+
+        Expected result only the entry read since it was set.
+        """
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3, ttl=3600)
+        cache.get('a')
+        cache.get('c')
+        self.assertEqual(cache.expiring(120), [('a', 1)])
+        cache.set('a', 1)
+        self.assertEqual(cache.expiring(120), [])
+
+    def test_refresh(self):
+        """ Makes a refresh pass over the cached tokens in use.
+
+        Expected result the tokens still valid are scoped anew, those about to
+        expire are left alone, and revoked ones are forgotten.
+        """
+        cache = TokenCache(maxsize=10, ttl=60, margin=60)
+        registry = SessionRegistry(maxsize=10, ttl=60, margin=60)
+        cache.put('valid', fake_session(3600), self.profile, 'student', issued_at=1000)
+        cache.put('expiring', fake_session(120), self.profile, 'student')
+        cache.put('revoked', fake_session(3600), self.profile, 'student')
+        cache.put('idle', fake_session(3600), self.profile, 'student')
+        registry.put('valid', 'DV1337', 'DV1337|lab1', fake_session(3600))
+        for token in ('valid', 'expiring', 'revoked'):
+            cache.get(token)
+        registry.get('valid', 'DV1337', 'DV1337|lab1')
+        renewed = fake_session(3600)
+        scopes = []
+
+        def rescope(token, domain='Default', project='Default'):
+            scopes.append((token, project))
+            if token == 'revoked':
+                raise RuntimeError('Token revoked')
+            return renewed
+
+        refresher = TokenRefresher(cache, registry, rescope, window=90)
+        self.assertEqual(refresher.refresh(), 2)
+        self.assertCountEqual(scopes, [('valid', 'Default'), ('revoked', 'Default'),
+                                       ('valid', 'DV1337|lab1')])
+        self.assertIs(cache.get('valid').session, renewed)
+        self.assertEqual(cache.get('valid').issued_at, 1000)
+        self.assertIsNone(cache.get('revoked'))
+        self.assertIsNotNone(cache.get('expiring'))